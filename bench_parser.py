@@ -0,0 +1,146 @@
+"""
+Benchmark de throughput do ZettaBrasilParser (itens por segundo):
+parser de referência (antes das otimizações: categorias sem memoização e
+re.sub por URL de imagem), caminho item a item (parse_item) e parse colunar
+em lotes (parse_batch).
+
+Uso:
+    python bench_parser.py [feed.json] [--items N] [--repeat N]
+
+Sem arquivo, gera um feed sintético no formato do Zetta Brasil.
+"""
+import argparse
+import random
+import re
+import time
+from typing import Any, Callable, Dict, List
+
+import serializer
+from json_fetcher import (
+    MAPEAMENTO_CATEGORIAS, PARSE_BATCH_SIZE, ZettaBrasilParser, converter_preco, decode_categorias,
+    decode_categorias_cached
+)
+
+def synthetic_feed(count: int, seed: int = 42) -> List[Dict[str, Any]]:
+    """Feed sintético com a variedade de formatos vista nos fornecedores"""
+    rnd = random.Random(seed)
+    codigos = list(MAPEAMENTO_CATEGORIAS) + ["99"]
+    items = []
+    for i in range(count):
+        categorias = rnd.sample(codigos, rnd.choice([1, 1, 2]))
+        imagens = [f"https://cdn.exemplo.com/img/{i}_{n}.jpg?v={rnd.randint(1, 9999)}" for n in range(rnd.choice([0, 1, 3]))]
+        items.append({
+            "pro_cod": i,
+            "codigo": str(10000 + i),
+            "nome": f"Produto {i}",
+            "complemento": rnd.choice(["", "caixa c/ 12", "fardo"]),
+            "marca": rnd.choice(["Dori", "Arcor", "Garoto", ""]),
+            "modelo": "",
+            "preco": rnd.choice([f"{rnd.uniform(1, 200):.2f}".replace(".", ","), rnd.uniform(1, 200), None]),
+            "peso": "1.5",
+            "altura": 0,
+            "largura": 0,
+            "comprimento": 0,
+            "categorias": serializer.dumps(categorias).decode() if rnd.random() < 0.8 else categorias,
+            "observacao": "",
+            "excluido": rnd.random() < 0.05,
+            "imagens": rnd.choice([imagens, [{"url": url} for url in imagens]])
+        })
+    return items
+
+def reference_images(imagens_data: Any) -> List[str]:
+    """normalize_images original: re.sub (com expansão do template) a cada URL"""
+    if not imagens_data:
+        return []
+    
+    result = []
+    if isinstance(imagens_data, str):
+        result.append(imagens_data.strip())
+    elif isinstance(imagens_data, list):
+        for item in imagens_data:
+            if isinstance(item, str):
+                result.append(item.strip())
+            elif isinstance(item, dict):
+                for key in ["url", "URL", "src", "path", "link", "href"]:
+                    if key in item and item[key]:
+                        result.append(str(item[key]).strip())
+                        break
+    
+    seen = set()
+    normalized = []
+    for url in result:
+        if url and url not in seen:
+            clean_url = re.sub(r'(\.(png|jpg|jpeg|gif|webp|bmp|svg))(\?.*)?$', r'\1', url, flags=re.IGNORECASE)
+            seen.add(clean_url)
+            normalized.append(clean_url)
+    return normalized
+
+def reference(parser: ZettaBrasilParser, items: List[Any]) -> List[Dict]:
+    """Parser original, item a item: decodifica as categorias de cada item e limpa URLs com re.sub"""
+    products = []
+    for item in items:
+        if not isinstance(item, dict) or item.get("excluido", False):
+            continue
+        products.append({
+            "codigo": item.get("codigo"),
+            "nome": item.get("nome"),
+            "complemento": item.get("complemento"),
+            "marca": item.get("marca"),
+            "modelo": item.get("modelo"),
+            "preco": converter_preco(item.get("preco")),
+            "peso": float(item.get("peso", 0.0)),
+            "altura": float(item.get("altura", 0.0)),
+            "largura": float(item.get("largura", 0.0)),
+            "comprimento": float(item.get("comprimento", 0.0)),
+            "categorias": decode_categorias(item.get("categorias")),
+            "observacao": item.get("observacao", ""),
+            "imagens": reference_images(item.get("imagens", []))
+        })
+    return products
+
+def per_item(parser: ZettaBrasilParser, items: List[Any]) -> List[Dict]:
+    return [parsed for parsed in map(parser.parse_item, items) if parsed is not None]
+
+def batched(parser: ZettaBrasilParser, items: List[Any]) -> List[Dict]:
+    return list(parser.parse_stream(items, ""))
+
+def measure(fn: Callable[[ZettaBrasilParser, List[Any]], List[Dict]], items: List[Any], repeat: int) -> float:
+    """Melhor tempo entre as repetições (cache de categorias limpo a cada rodada)"""
+    parser = ZettaBrasilParser()
+    best = float("inf")
+    for _ in range(repeat):
+        decode_categorias_cached.cache_clear()
+        start = time.perf_counter()
+        fn(parser, items)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("feed", nargs="?", help="arquivo JSON com a lista de itens do fornecedor")
+    arg_parser.add_argument("--items", type=int, default=50000, help="itens do feed sintético")
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+    
+    items = serializer.load_file(args.feed) if args.feed else synthetic_feed(args.items)
+    
+    # Os três caminhos precisam produzir exatamente os mesmos registros
+    parser = ZettaBrasilParser()
+    expected = reference(parser, items)
+    if per_item(parser, items) != expected:
+        raise SystemExit("[ERRO] parse_item diverge do parser de referência")
+    if batched(parser, items) != expected:
+        raise SystemExit("[ERRO] parse_batch diverge do parser de referência")
+    
+    print(f"{len(items)} itens, lotes de {PARSE_BATCH_SIZE}, melhor de {args.repeat}")
+    results = {}
+    for name, fn in (("referência", reference), ("item a item", per_item), ("colunar", batched)):
+        elapsed = measure(fn, items, args.repeat)
+        results[name] = len(items) / elapsed
+        print(f"  {name:<12} {elapsed * 1000:8.1f} ms  {results[name]:>12,.0f} itens/s")
+    
+    print(f"  ganho sobre a referência: item a item {results['item a item'] / results['referência']:.2f}x, "
+          f"colunar {results['colunar'] / results['referência']:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+import mmap
+import os
+import struct
+from typing import Any, Dict, Iterable, Iterator, Optional, Sequence, Union
+
+import numpy as np
+
+import serializer
+
+# =================== FORMATO DO SNAPSHOT BINÁRIO =======================
+#
+# [prefixo fixo]  magic (8) | versão u32 | reservado u32 | geração u64 | offset do diretório u64 | tamanho u64
+# [seções]        colunas de texto: dados concatenados + offsets u64 (n + 1), alinhados em 8 bytes
+#                 colunas de largura fixa: arrays NumPy (float64, bool, int64...)
+#                 blobs: corpos pré-serializados/comprimidos
+# [diretório]     JSON com a posição de cada seção e metadados
+#
+# Escrito em arquivo temporário e publicado com os.replace (troca atômica).
+
+MAGIC = b"DMCATBIN"
+VERSION = 2
+PREFIX = struct.Struct("<8sIIQQQ")
+
+def _align(f, boundary: int = 8):
+    """Completa o arquivo com zeros até o próximo múltiplo de `boundary`"""
+    padding = -f.tell() % boundary
+    if padding:
+        f.write(b"\0" * padding)
+
+def write_snapshot_file(path: str, generation: int, meta: Dict[str, Any],
+                        string_columns: Dict[str, Iterable[bytes]],
+                        arrays: Dict[str, np.ndarray],
+                        blobs: Dict[str, bytes]):
+    """Grava o snapshot binário de forma atômica"""
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    directory = {"meta": meta, "strings": {}, "arrays": {}, "blobs": {}}
+    
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(b"\0" * PREFIX.size)
+            
+            for name, values in string_columns.items():
+                # Tabela de strings: dados concatenados e, depois, os offsets
+                data_pos = f.tell()
+                offsets = [0]
+                for value in values:
+                    f.write(value)
+                    offsets.append(offsets[-1] + len(value))
+                _align(f)
+                offsets_pos = f.tell()
+                f.write(np.asarray(offsets, dtype="<u8").tobytes())
+                directory["strings"][name] = {
+                    "data": data_pos, "offsets": offsets_pos, "count": len(offsets) - 1
+                }
+            
+            for name, array in arrays.items():
+                _align(f)
+                array = np.ascontiguousarray(array)
+                directory["arrays"][name] = {
+                    "pos": f.tell(), "dtype": array.dtype.str, "count": len(array)
+                }
+                f.write(array.tobytes())
+            
+            for name, blob in blobs.items():
+                directory["blobs"][name] = {"pos": f.tell(), "size": len(blob)}
+                f.write(blob)
+            
+            directory_bytes = serializer.dumps(directory)
+            directory_pos = f.tell()
+            f.write(directory_bytes)
+            
+            f.seek(0)
+            f.write(PREFIX.pack(MAGIC, VERSION, 0, generation, directory_pos, len(directory_bytes)))
+            f.flush()
+            os.fsync(f.fileno())
+        
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def read_generation(path: str) -> Optional[int]:
+    """Lê só o prefixo do arquivo para saber a geração (None se não houver snapshot válido)"""
+    try:
+        with open(path, "rb") as f:
+            prefix = f.read(PREFIX.size)
+    except OSError:
+        return None
+    
+    if len(prefix) < PREFIX.size:
+        return None
+    magic, version, _, generation, _, _ = PREFIX.unpack(prefix)
+    if magic != MAGIC or version != VERSION:
+        return None
+    return generation
+
+class StringColumn(Sequence):
+    """Coluna de texto lida sob demanda do mmap (cada item é uma fatia de bytes)"""
+    
+    def __init__(self, buffer: memoryview, data_pos: int, offsets: memoryview):
+        self._buffer = buffer
+        self._data_pos = data_pos
+        self._offsets = offsets
+    
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+    
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        start = self._data_pos + self._offsets[i]
+        end = self._data_pos + self._offsets[i + 1]
+        return bytes(self._buffer[start:end])
+    
+    def __iter__(self) -> Iterator[bytes]:
+        for i in range(len(self)):
+            yield self[i]
+
+class SnapshotFile:
+    """
+    Snapshot binário mapeado em memória (somente leitura).
+    Vários processos que abrem o mesmo arquivo compartilham as páginas pelo
+    page cache do sistema. O mapeamento é liberado quando não houver mais
+    referências (colunas, arrays ou blobs) a ele.
+    """
+    
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buffer = memoryview(self._mmap)
+        
+        magic, version, _, generation, directory_pos, directory_size = PREFIX.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Snapshot binário inválido: {path}")
+        
+        self.generation = generation
+        self._directory = serializer.loads(bytes(self._buffer[directory_pos:directory_pos + directory_size]))
+        self.meta: Dict[str, Any] = self._directory["meta"]
+    
+    def strings(self, name: str, start: int = 0, stop: Optional[int] = None) -> StringColumn:
+        """Coluna de texto; com `start`/`stop`, só o intervalo [start, stop) dos itens"""
+        entry = self._directory["strings"][name]
+        offsets_size = (entry["count"] + 1) * 8
+        offsets = self._buffer[entry["offsets"]:entry["offsets"] + offsets_size].cast("Q")
+        if stop is None:
+            stop = entry["count"]
+        # Os offsets são relativos ao início dos dados: basta recortar a tabela
+        return StringColumn(self._buffer, entry["data"], offsets[start:stop + 1])
+    
+    def string_count(self, name: str) -> int:
+        return self._directory["strings"][name]["count"]
+    
+    def array(self, name: str) -> np.ndarray:
+        entry = self._directory["arrays"][name]
+        return np.frombuffer(self._mmap, dtype=np.dtype(entry["dtype"]), count=entry["count"], offset=entry["pos"])
+    
+    def blob(self, name: str) -> Union[memoryview, None]:
+        entry = self._directory["blobs"].get(name)
+        if entry is None:
+            return None
+        return self._buffer[entry["pos"]:entry["pos"] + entry["size"]]
+    
+    def has_array(self, name: str) -> bool:
+        return name in self._directory["arrays"]
+    
+    def blob_names(self) -> Iterable[str]:
+        return self._directory["blobs"].keys()
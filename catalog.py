@@ -0,0 +1,1219 @@
+import gzip
+import hashlib
+import os
+import threading
+import time
+from bisect import bisect_left
+from dataclasses import dataclass, replace
+from datetime import datetime
+from functools import cached_property
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Any, Sequence, Set, Tuple, Union
+import numpy as np
+from unidecode import unidecode
+
+import serializer
+from binary_snapshot import SnapshotFile, StringColumn, read_generation, write_snapshot_file
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional: sem ele, só gzip
+    brotli = None
+
+# Campos com colunas de texto normalizado pré-computadas
+SEARCH_FIELDS = ["nome", "marca", "modelo", "categorias", "complemento", "observacao", "codigo"]
+
+# Campos de busca flexível com índice invertido
+TEXT_FIELDS = ["nome", "marca", "modelo", "categorias", "complemento", "observacao"]
+
+# Qualidade do brotli para as variantes pré-comprimidas (11 é lento demais para catálogos grandes)
+BROTLI_QUALITY = 9
+
+# Tamanhos dos n-gramas de caracteres indexados (palavras da query têm no mínimo 2 caracteres)
+NGRAM_SIZES = (2, 3)
+
+# Fração máxima de registros refeitos para manter índice e ordenação por delta
+# (acima disso, a reconstrução completa sai mais barata)
+DELTA_MAX_FRACTION = 0.25
+
+# =================== DIFERENÇA ENTRE GERAÇÕES =======================
+
+def encode_records(products: Sequence[Dict[str, Any]]) -> Tuple[bytes, ...]:
+    """JSON compacto de cada registro (o mesmo gravado na coluna `record` do snapshot binário)"""
+    return tuple(encode_json(p) for p in products)
+
+def record_digests(records: Sequence[bytes]) -> np.ndarray:
+    """Hash de 16 bytes do JSON de cada registro, para comparar gerações"""
+    return np.array([hashlib.blake2b(record, digest_size=16).digest() for record in records], dtype="S16")
+
+@dataclass(frozen=True)
+class CatalogDiff:
+    """
+    Diferença da geração em relação à anterior.
+    As contagens são por código de produto (comparando o hash dos registros).
+    `reused[i]` é a posição anterior de um registro idêntico ao da posição i
+    (ou -1); cada registro anterior é reaproveitado por no máximo uma posição,
+    então inserções e remoções no meio do catálogo só deslocam os demais.
+    `positions` lista as posições cujo registro mudou em relação à mesma
+    posição da geração anterior (inclusive as acrescentadas/removidas no fim).
+    Com `rebuild_reason`, a mudança é grande demais e as estruturas derivadas
+    (índice e ordem de preços) são reconstruídas em vez de atualizadas.
+    """
+    added: int
+    removed: int
+    changed: int
+    unchanged: int
+    reused: np.ndarray
+    positions: np.ndarray
+    rebuilt_records: int
+    dropped_records: int
+    rebuild_reason: Optional[str] = None
+    
+    @property
+    def incremental(self) -> bool:
+        """Índice e ordem de preços são atualizados por delta"""
+        return self.rebuild_reason is None
+    
+    def carry(self, previous: Sequence[Any], compute: Callable[[int], Any]) -> List[Any]:
+        """
+        Coluna da nova geração: valores anteriores dos registros reaproveitados
+        (onde quer que estejam agora) e `compute(i)` para os demais
+        """
+        return [previous[j] if j >= 0 else compute(i) for i, j in enumerate(self.reused.tolist())]
+    
+    def moved(self, previous_count: int) -> Optional[np.ndarray]:
+        """
+        Nova posição de cada registro anterior (-1 se não foi reaproveitado),
+        quando os reaproveitados mantêm a ordem relativa entre si; None se algum
+        registro trocou de lugar com outro
+        """
+        carried = np.flatnonzero(self.reused >= 0)
+        sources = self.reused[carried]
+        if np.any(sources[1:] <= sources[:-1]):
+            return None
+        moved = np.full(previous_count, -1, dtype=np.int64)
+        moved[sources] = carried
+        return moved
+    
+    def summary(self) -> Dict[str, Any]:
+        """Tamanho da atualização para o endpoint de status"""
+        return {
+            "added": self.added,
+            "removed": self.removed,
+            "changed": self.changed,
+            "unchanged": self.unchanged,
+            "incremental": self.incremental,
+            # Registros refeitos e descartados, independente de deslocamentos de posição
+            "records_rebuilt": self.rebuilt_records,
+            "records_dropped": self.dropped_records,
+            "positions_changed": len(self.positions),
+            "rebuild_reason": self.rebuild_reason,
+            "delta_max_fraction": DELTA_MAX_FRACTION
+        }
+
+def diff_catalog(previous_codes: Sequence[str], previous_digests: np.ndarray,
+                 codes: Sequence[str], digests: np.ndarray) -> CatalogDiff:
+    """Compara duas gerações pelo hash dos registros, por código e por posição"""
+    previous_by_code: Dict[str, List[bytes]] = {}
+    for code, digest in zip(previous_codes, previous_digests.tolist()):
+        previous_by_code.setdefault(code, []).append(digest)
+    by_code: Dict[str, List[bytes]] = {}
+    for code, digest in zip(codes, digests.tolist()):
+        by_code.setdefault(code, []).append(digest)
+    
+    added = sum(1 for code in by_code if code not in previous_by_code)
+    removed = sum(1 for code in previous_by_code if code not in by_code)
+    changed = sum(
+        1 for code, code_digests in by_code.items()
+        if code in previous_by_code and sorted(code_digests) != sorted(previous_by_code[code])
+    )
+    
+    # Registros idênticos em qualquer posição reaproveitam o trabalho já feito;
+    # registros repetidos casam em ordem, um para um
+    previous_positions: Dict[bytes, List[int]] = {}
+    for j, digest in enumerate(previous_digests.tolist()):
+        previous_positions.setdefault(digest, []).append(j)
+    cursor: Dict[bytes, int] = {}
+    reused = np.full(len(digests), -1, dtype=np.int64)
+    for i, digest in enumerate(digests.tolist()):
+        candidates = previous_positions.get(digest)
+        k = cursor.get(digest, 0)
+        if candidates is not None and k < len(candidates):
+            reused[i] = candidates[k]
+            cursor[digest] = k + 1
+    
+    # Posições com registro diferente, mais as acrescentadas/removidas no fim
+    common = min(len(previous_digests), len(digests))
+    positions = np.concatenate([
+        np.flatnonzero(previous_digests[:common] != digests[:common]),
+        np.arange(common, max(len(previous_digests), len(digests)))
+    ]).astype(np.int64)
+    
+    # O custo do delta acompanha os registros refeitos, não o deslocamento das posições
+    carried = int(np.count_nonzero(reused >= 0))
+    rebuilt_records = len(digests) - carried
+    dropped_records = len(previous_digests) - carried
+    rebuild_reason = None
+    if max(rebuilt_records, dropped_records) > DELTA_MAX_FRACTION * max(len(digests), 1):
+        rebuild_reason = "too_many_changes"
+    
+    return CatalogDiff(
+        added=added,
+        removed=removed,
+        changed=changed,
+        unchanged=len(by_code) - added - changed,
+        reused=reused,
+        positions=positions,
+        rebuilt_records=rebuilt_records,
+        dropped_records=dropped_records,
+        rebuild_reason=rebuild_reason
+    )
+
+def listing_unchanged(previous_products: Sequence[Dict[str, Any]], products: Sequence[Dict[str, Any]],
+                      positions: np.ndarray) -> bool:
+    """O /list da geração anterior continua válido (nenhuma linha ou categoria mudou)"""
+    if len(previous_products) != len(products):
+        return False
+    return all(
+        category_listing_entry(previous_products[i]) == category_listing_entry(products[i])
+        for i in positions.tolist()
+    )
+
+# =================== NORMALIZAÇÃO =======================
+
+def normalize_text(text: Any) -> str:
+    """Normaliza texto para comparação"""
+    if not text:
+        return ""
+    return unidecode(str(text)).lower().replace("-", "").replace(" ", "").strip()
+
+def convert_price(price_str: Any) -> Optional[float]:
+    """Converte string de preço para float"""
+    if not price_str:
+        return None
+    try:
+        if isinstance(price_str, (int, float)):
+            return float(price_str)
+        
+        cleaned = str(price_str).replace(",", ".").replace("R$", "").strip()
+        return float(cleaned)
+    except (ValueError, TypeError):
+        return None
+
+@dataclass(frozen=True)
+class NormalizedColumn:
+    """
+    Coluna de texto normalizado de um campo, codificada por dicionário.
+    `contents` traz os conteúdos distintos não vazios (UTF-8) em ordem crescente
+    e `ids[i]` o id do conteúdo do produto na posição i (-1 se vazio).
+    """
+    contents: Sequence[bytes]
+    ids: np.ndarray
+    
+    def text(self, i: int) -> str:
+        """Conteúdo normalizado do produto na posição i"""
+        content_id = self.ids[i]
+        return self.contents[content_id].decode("utf-8") if content_id >= 0 else ""
+    
+    def texts(self) -> Iterator[bytes]:
+        """Conteúdo (UTF-8) de cada posição, em ordem"""
+        contents = self.contents
+        for content_id in self.ids.tolist():
+            yield contents[content_id] if content_id >= 0 else b""
+    
+    def find(self, text: str) -> int:
+        """Id do conteúdo (busca binária no dicionário; -1 se nenhum produto o tem)"""
+        return find_key(self.contents, text.encode("utf-8"))
+    
+    def expand(self, matched: np.ndarray) -> np.ndarray:
+        """Máscara por posição dos produtos cujo conteúdo está marcado em `matched` (máscara por id de conteúdo)"""
+        return np.append(matched, False)[self.ids]
+
+@dataclass(frozen=True)
+class DictionaryUpdate:
+    """
+    Mudança de um dicionário ordenado de uma geração para a seguinte:
+    `remap[j]` é o novo id do item anterior j (-1 se saiu) e `added` traz os
+    itens novos, com os seus ids em `added_ids`.
+    """
+    remap: np.ndarray
+    added: Sequence[bytes]
+    added_ids: np.ndarray
+
+def find_key(keys: Sequence[bytes], key: bytes) -> int:
+    """Posição da chave num dicionário ordenado (-1 se não estiver nele)"""
+    i = bisect_left(keys, key)
+    return i if i < len(keys) and keys[i] == key else -1
+
+def intern_keys(previous: Sequence[bytes], keys: Sequence[bytes]) -> Tuple[np.ndarray, List[bytes]]:
+    """
+    Ids provisórios de `keys` num dicionário ordenado: o id anterior das chaves
+    que já estão em `previous` e len(previous) + j para a j-ésima chave nova.
+    Retorna os ids e as chaves novas, em ordem crescente.
+    """
+    lookup = {key: find_key(previous, key) for key in set(keys)}
+    added = sorted(key for key, key_id in lookup.items() if key_id < 0)
+    lookup.update(zip(added, range(len(previous), len(previous) + len(added))))
+    return np.array([lookup[key] for key in keys], dtype=np.int64), added
+
+def compact_dictionary(previous: Sequence[bytes], added: List[bytes], used: np.ndarray
+                       ) -> Tuple[np.ndarray, Sequence[bytes]]:
+    """
+    Intercala as chaves anteriores e as novas (ambas em ordem crescente),
+    mantendo só as marcadas em `used` (por id provisório, como em intern_keys).
+    Retorna o novo id de cada id provisório (-1 se descartado) e as chaves
+    resultantes. A conversão preserva a ordem: listas ordenadas de ids
+    continuam ordenadas depois de convertidas.
+    """
+    count = len(previous)
+    if not added and used.all():
+        return np.arange(count, dtype=np.int64), previous
+    
+    # Posição de cada chave na intercalação das duas listas
+    at = np.array([bisect_left(previous, key) for key in added], dtype=np.int64)
+    rank = np.concatenate([
+        np.arange(count, dtype=np.int64) + np.searchsorted(at, np.arange(count), side="right"),
+        at + np.arange(len(added), dtype=np.int64)
+    ])
+    kept = np.zeros(len(rank), dtype=bool)
+    kept[rank[used]] = True
+    remap = np.where(used, (np.cumsum(kept) - 1)[rank], -1)
+    
+    keys: List[bytes] = [b""] * int(kept.sum())
+    remap_list = remap.tolist()
+    for key_id in np.flatnonzero(used).tolist():
+        keys[remap_list[key_id]] = previous[key_id] if key_id < count else added[key_id - count]
+    return remap, tuple(keys)
+
+def build_column(count: int, text: Callable[[int], bytes], previous: Optional[NormalizedColumn] = None,
+                 reused: Optional[np.ndarray] = None) -> Tuple[NormalizedColumn, DictionaryUpdate]:
+    """
+    Codifica por dicionário a coluna de `count` produtos (`text(i)`: conteúdo
+    normalizado, em UTF-8, do produto i).
+    Com `previous` e `reused` (posição anterior de um registro idêntico, ou -1),
+    os registros reaproveitados mantêm o conteúdo anterior, só os demais são
+    normalizados e os conteúdos novos são intercalados no dicionário.
+    Retorna a coluna e a mudança do dicionário (base da atualização do índice).
+    """
+    ids = np.full(count, -1, dtype=np.int64)
+    if previous is None:
+        previous_contents: Sequence[bytes] = ()
+        pending = list(range(count))
+    else:
+        previous_contents = previous.contents
+        carried = reused >= 0
+        ids[carried] = previous.ids[reused[carried]]
+        pending = np.flatnonzero(~carried).tolist()
+    
+    texts = [text(i) for i in pending]
+    filled = [i for i, content in zip(pending, texts) if content]
+    filled_ids, added = intern_keys(previous_contents, [content for content in texts if content])
+    ids[filled] = filled_ids
+    
+    used = np.zeros(len(previous_contents) + len(added), dtype=bool)
+    used[ids[ids >= 0]] = True
+    remap, contents = compact_dictionary(previous_contents, added, used)
+    
+    column_ids = np.full(count, -1, dtype=np.int32)
+    column_ids[ids >= 0] = remap[ids[ids >= 0]]
+    previous_count = len(previous_contents)
+    update = DictionaryUpdate(remap=remap[:previous_count], added=added, added_ids=remap[previous_count:])
+    return NormalizedColumn(contents=contents, ids=column_ids), update
+
+def build_columns(products: List[Dict[str, Any]], previous: Optional[Mapping[str, NormalizedColumn]] = None,
+                  diff: Optional[CatalogDiff] = None
+                  ) -> Tuple[Dict[str, NormalizedColumn], Dict[str, DictionaryUpdate]]:
+    """
+    Normaliza uma única vez os campos pesquisáveis de todo o catálogo.
+    Com `previous` e `diff`, só os registros novos ou alterados são normalizados.
+    Retorna as colunas e, por campo, a mudança do dicionário de conteúdos.
+    """
+    # Marcas, categorias etc. se repetem muito: normaliza cada valor distinto uma vez
+    cache: Dict[str, bytes] = {}
+    
+    def normalized(p: Dict[str, Any], field: str) -> bytes:
+        raw = str(p.get(field, ""))
+        content = cache.get(raw)
+        if content is None:
+            content = cache[raw] = normalize_text(raw).encode("utf-8")
+        return content
+    
+    reused = diff.reused if diff is not None else None
+    columns = {}
+    updates = {}
+    for field in SEARCH_FIELDS:
+        columns[field], updates[field] = build_column(
+            len(products), lambda i: normalized(products[i], field),
+            previous[field] if diff is not None else None, reused
+        )
+    return columns, updates
+
+@dataclass(frozen=True)
+class PriceColumn:
+    """
+    Coluna de preços em float alinhada à posição dos produtos.
+    Produtos sem preço válido têm 0 em `values` e False em `valid`.
+    `order` traz as posições em ordem crescente de preço (ordenação estável).
+    """
+    values: np.ndarray
+    valid: np.ndarray
+    order: np.ndarray
+
+def build_price_column(products: List[Dict[str, Any]], previous: Optional[PriceColumn] = None,
+                       diff: Optional[CatalogDiff] = None) -> PriceColumn:
+    """
+    Converte uma única vez o preço de todos os produtos.
+    Com `previous` e `diff`, copia os preços dos registros reaproveitados e
+    leva a ordenação anterior para as novas posições, inserindo só os demais.
+    """
+    values = np.zeros(len(products), dtype=np.float64)
+    valid = np.zeros(len(products), dtype=bool)
+    
+    if diff is None:
+        pending = range(len(products))
+    else:
+        reused = diff.reused
+        carried = reused >= 0
+        values[carried] = previous.values[reused[carried]]
+        valid[carried] = previous.valid[reused[carried]]
+        pending = np.flatnonzero(~carried).tolist()
+    
+    for i in pending:
+        price = convert_price(products[i].get("preco"))
+        if price is not None:
+            values[i] = price
+            valid[i] = True
+    
+    moved = diff.moved(len(previous.values)) if diff is not None and diff.incremental else None
+    if moved is not None:
+        order = update_price_order(previous.order, values, moved, np.flatnonzero(diff.reused < 0))
+    else:
+        order = np.argsort(values, kind="stable")
+    return PriceColumn(values=values, valid=valid, order=order)
+
+def update_price_order(order: np.ndarray, values: np.ndarray, moved: np.ndarray, inserted: np.ndarray) -> np.ndarray:
+    """
+    Ordenação estável (preço, posição) atualizada por delta: leva a ordem
+    anterior para as novas posições (`moved`, que preserva a ordem relativa),
+    descarta os registros que saíram e insere as posições em `inserted`.
+    """
+    kept = moved[order]
+    kept = kept[kept >= 0]
+    inserted = inserted[np.argsort(values[inserted], kind="stable")]
+    
+    # Os preços mantidos não mudaram e `moved` preserva a ordem das posições: `kept` continua ordenado
+    kept_values = values[kept]
+    left = np.searchsorted(kept_values, values[inserted], side="left")
+    right = np.searchsorted(kept_values, values[inserted], side="right")
+    # Empates de preço ficam em ordem de posição (como no argsort estável)
+    at = [lo + int(np.searchsorted(kept[lo:hi], i)) for lo, hi, i in zip(left, right, inserted)]
+    return np.insert(kept, at, inserted)
+
+# =================== PROJEÇÕES PRÉ-SERIALIZADAS =======================
+
+def encode_json(obj: Any) -> bytes:
+    """Serializa no mesmo formato compacto usado pelas respostas da API"""
+    return serializer.dumps(obj)
+
+def simple_view(product: Dict[str, Any]) -> Dict[str, Any]:
+    """Versão simples do produto (só a primeira imagem), sem alterar o original"""
+    imagens = product.get("imagens")
+    simple = dict(product)
+    simple["imagens"] = [imagens[0]] if isinstance(imagens, list) and len(imagens) > 0 else []
+    return simple
+
+def build_simple_fragments(products: List[Dict[str, Any]], previous: Optional[Sequence[bytes]] = None,
+                           diff: Optional[CatalogDiff] = None) -> Tuple[bytes, ...]:
+    """
+    JSON da versão simples de cada produto, gerado uma vez por carga do catálogo
+    (registros inalterados reaproveitam o fragmento da geração anterior)
+    """
+    if diff is None:
+        return tuple(encode_json(simple_view(p)) for p in products)
+    return tuple(diff.carry(previous, lambda i: encode_json(simple_view(products[i]))))
+
+@dataclass(frozen=True)
+class EncodedPayload:
+    """
+    Corpo de resposta pré-serializado, estável durante uma geração do catálogo.
+    `encoded` guarda as variantes pré-comprimidas por content-coding (gzip, br).
+    Vindos do snapshot binário, os corpos são fatias (memoryview) do mmap.
+    """
+    body: Union[bytes, memoryview]
+    etag: str
+    encoded: Dict[str, Union[bytes, memoryview]]
+    
+    def variant_etag(self, encoding: Optional[str]) -> str:
+        """ETag forte de cada representação (sem compressão ou comprimida)"""
+        if not encoding:
+            return self.etag
+        return f'{self.etag[:-1]}-{encoding}"'
+
+def compress_variants(body: bytes) -> Dict[str, bytes]:
+    """Variantes comprimidas com o nível máximo razoável (feito uma vez por geração)"""
+    variants = {"gzip": gzip.compress(body, compresslevel=9)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(body, quality=BROTLI_QUALITY)
+    return variants
+
+def make_payload(body: bytes) -> EncodedPayload:
+    """Empacota o corpo com um ETag forte derivado do conteúdo da geração"""
+    return EncodedPayload(
+        body=body,
+        etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+        encoded=compress_variants(body)
+    )
+
+def build_full_stock_payload(fragments: Sequence[bytes], order: np.ndarray) -> EncodedPayload:
+    """
+    Resposta completa do estoque (sem filtros) em ordem crescente de preço,
+    montada a partir do JSON pré-serializado de cada produto (registro
+    completo ou versão simples)
+    """
+    body = b"".join([
+        b'{"resultados":[', b",".join([fragments[i] for i in order.tolist()]), b"],",
+        b'"total_encontrado":', str(len(fragments)).encode("ascii"), b",",
+        b'"info":', encode_json("Exibindo todo o estoque disponível"), b"}"
+    ])
+    return make_payload(body)
+
+def category_listing_entry(p: Dict[str, Any]) -> Tuple[str, List[str]]:
+    """Linha do produto no /list e as categorias em que ele aparece"""
+    categorias_str = p.get("categorias", "sem categoria")
+    
+    # Monta linha CSV: codigo,nome
+    linha = f"{p.get('codigo', '')},{p.get('nome', '')}"
+    
+    # Se produto tem múltiplas categorias (separadas por vírgula)
+    if categorias_str:
+        cats = [cat.strip() or "sem categoria" for cat in str(categorias_str).split(",")]
+    else:
+        cats = ["sem categoria"]
+    
+    return linha, cats
+
+def build_category_listing(products: List[Dict[str, Any]]) -> EncodedPayload:
+    """Lista de produtos agrupados por categoria (formato compacto do endpoint /list)"""
+    categorias_dict: Dict[str, List[str]] = {}
+    
+    for p in products:
+        linha, cats = category_listing_entry(p)
+        
+        # Adiciona o produto em cada categoria que ele pertence
+        for cat in cats:
+            categorias_dict.setdefault(cat, []).append(linha)
+    
+    # Ordena as categorias alfabeticamente
+    return make_payload(encode_json(dict(sorted(categorias_dict.items()))))
+
+# =================== ÍNDICE INVERTIDO =======================
+
+@dataclass(frozen=True)
+class FieldIndex:
+    """
+    Índice invertido de um campo sobre os conteúdos distintos da sua coluna
+    normalizada. N-gramas de bytes (`gram_keys`, em ordem crescente) e termos
+    do vocabulário (`terms`: conteúdos completos e palavras com 3+ caracteres,
+    em ordem crescente) apontam para listas ordenadas de ids de conteúdo em
+    int32, no formato CSR: a lista da chave k é postings[offsets[k]:offsets[k + 1]].
+    As posições dos produtos só são obtidas ao expandir o resultado pela coluna.
+    `vocabulary_ids` restringe o vocabulário da busca aproximada a alguns
+    termos (os da fatia de um shard); None expõe todos.
+    """
+    gram_keys: np.ndarray
+    gram_offsets: np.ndarray
+    gram_postings: np.ndarray
+    terms: Sequence[bytes]
+    term_offsets: np.ndarray
+    term_postings: np.ndarray
+    vocabulary_ids: Optional[np.ndarray] = None
+    
+    def gram(self, gram: bytes) -> np.ndarray:
+        """Ids dos conteúdos que contêm o n-grama (lista vazia se nenhum)"""
+        key = gram_key(gram)
+        k = int(np.searchsorted(self.gram_keys, key))
+        if k == len(self.gram_keys) or self.gram_keys[k] != key:
+            return self.gram_postings[:0]
+        return self.gram_postings[self.gram_offsets[k]:self.gram_offsets[k + 1]]
+    
+    def term(self, term_id: int) -> np.ndarray:
+        """Ids dos conteúdos que têm o termo (`term_id`: posição do termo em `vocabulary`)"""
+        if self.vocabulary_ids is not None:
+            term_id = self.vocabulary_ids[term_id]
+        return self.term_postings[self.term_offsets[term_id]:self.term_offsets[term_id + 1]]
+    
+    @cached_property
+    def vocabulary(self) -> Tuple[str, ...]:
+        """Termos como texto para o rapidfuzz (decodificados na primeira busca aproximada no campo)"""
+        if self.vocabulary_ids is not None:
+            return tuple(self.terms[term_id].decode("utf-8") for term_id in self.vocabulary_ids.tolist())
+        return tuple(term.decode("utf-8") for term in self.terms)
+
+# Metade baixa dos pares (chave << 32 | id) usados para montar as listas
+PAIR_ID_MASK = np.uint64(0xFFFFFFFF)
+PAIR_SHIFT = np.uint64(32)
+
+def gram_key(gram: bytes) -> int:
+    """Chave inteira de um n-grama: o tamanho no byte mais alto, seguido dos bytes (tamanhos diferentes não colidem)"""
+    return int.from_bytes(bytes((len(gram),)) + gram, "big")
+
+def byte_ngrams(content: bytes, size: int) -> Set[bytes]:
+    """
+    Conjunto de n-gramas de bytes de um conteúdo em UTF-8 (substring nos bytes
+    equivale a substring no texto)
+    """
+    return {content[i:i + size] for i in range(len(content) - size + 1)}
+
+def vocabulary_terms(text: str) -> Set[str]:
+    """Termos do vocabulário de um conteúdo: o conteúdo completo e as palavras com 3+ caracteres"""
+    return {text, *(word for word in text.split() if len(word) >= 3)}
+
+def gram_pairs(contents: Sequence[bytes], ids: np.ndarray) -> np.ndarray:
+    """
+    Pares (chave do n-grama << 32 | id do conteúdo) dos n-gramas indexados
+    (NGRAM_SIZES) dos conteúdos, em ordem e sem repetição, calculados em lote
+    """
+    lengths = np.fromiter(map(len, contents), dtype=np.int64, count=len(contents))
+    data = np.frombuffer(b"".join(contents), dtype=np.uint8).astype(np.uint64)
+    starts = np.cumsum(lengths) - lengths
+    ids = np.asarray(ids).astype(np.uint64)
+    
+    pairs = [np.empty(0, dtype=np.uint64)]
+    for size in NGRAM_SIZES:
+        counts = np.maximum(lengths - size + 1, 0)
+        owner = np.repeat(np.arange(len(contents)), counts)
+        # Início de cada janela: início do conteúdo mais o deslocamento dentro dele
+        at = starts[owner] + np.arange(len(owner)) - np.repeat(np.cumsum(counts) - counts, counts)
+        keys = np.full(len(owner), size, dtype=np.uint64)
+        for k in range(size):
+            keys = (keys << np.uint64(8)) | data[at + k]
+        pairs.append((keys << PAIR_SHIFT) | ids[owner])
+    return sorted_unique(np.concatenate(pairs))
+
+def sorted_unique(values: np.ndarray) -> np.ndarray:
+    """Valores em ordem crescente, sem repetição (ordenação simples, mais rápida que np.unique para inteiros)"""
+    values = np.sort(values)
+    if len(values):
+        values = values[np.append(True, values[1:] != values[:-1])]
+    return values
+
+def pairs_from_postings(keys: np.ndarray, offsets: np.ndarray, postings: np.ndarray,
+                        remap: np.ndarray) -> np.ndarray:
+    """Pares (chave << 32 | id) das listas CSR, com os ids convertidos por `remap` (os que saíram são descartados)"""
+    owners = np.repeat(np.asarray(keys, dtype=np.uint64), np.diff(offsets))
+    ids = remap[postings]
+    kept = ids >= 0
+    return (owners[kept] << PAIR_SHIFT) | ids[kept].astype(np.uint64)
+
+def postings_from_pairs(pairs: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Pares ordenados (chave << 32 | id) → (chaves distintas, offsets CSR, ids em int32)"""
+    keys = pairs >> PAIR_SHIFT
+    first = np.ones(len(keys), dtype=bool)
+    first[1:] = keys[1:] != keys[:-1]
+    starts = np.flatnonzero(first)
+    return keys[starts], np.append(starts, len(keys)).astype(np.int64), (pairs & PAIR_ID_MASK).astype(np.int32)
+
+def merge_pairs(pairs: np.ndarray, added: np.ndarray) -> np.ndarray:
+    """Intercala dois arrays ordenados de pares sem elementos em comum"""
+    return np.insert(pairs, np.searchsorted(pairs, added), added)
+
+def update_field_index(previous: Optional[FieldIndex], update: DictionaryUpdate) -> FieldIndex:
+    """
+    Índice do campo a partir do anterior e da mudança do dicionário de conteúdos:
+    as listas anteriores só têm os ids convertidos (conteúdos que saíram são
+    descartados) e n-gramas e termos são calculados só para os conteúdos novos.
+    Sem `previous`, constrói o índice do zero (todos os conteúdos são novos).
+    """
+    grams = gram_pairs(update.added, update.added_ids)
+    if previous is not None:
+        grams = merge_pairs(pairs_from_postings(
+            previous.gram_keys, previous.gram_offsets, previous.gram_postings, update.remap
+        ), grams)
+    gram_keys, gram_offsets, gram_postings = postings_from_pairs(grams)
+    
+    # Vocabulário: termos dos conteúdos novos, intercalados aos anteriores
+    previous_terms = previous.terms if previous is not None else ()
+    added_terms = []
+    owners = []
+    for content, content_id in zip(update.added, update.added_ids.tolist()):
+        for term in vocabulary_terms(content.decode("utf-8")):
+            added_terms.append(term.encode("utf-8"))
+            owners.append(content_id)
+    term_ids, new_terms = intern_keys(previous_terms, added_terms)
+    added_pairs = (term_ids.astype(np.uint64) << PAIR_SHIFT) | np.array(owners, dtype=np.uint64)
+    carried = np.empty(0, dtype=np.uint64)
+    if previous is not None:
+        carried = pairs_from_postings(
+            np.arange(len(previous_terms)), previous.term_offsets, previous.term_postings, update.remap
+        )
+    
+    # Termos sem nenhum conteúdo saem do vocabulário
+    used = np.zeros(len(previous_terms) + len(new_terms), dtype=bool)
+    used[(carried >> PAIR_SHIFT).astype(np.int64)] = True
+    used[term_ids] = True
+    term_remap, terms = compact_dictionary(previous_terms, new_terms, used)
+    
+    def rekey(pairs: np.ndarray) -> np.ndarray:
+        term_id = term_remap[(pairs >> PAIR_SHIFT).astype(np.int64)].astype(np.uint64)
+        return (term_id << PAIR_SHIFT) | (pairs & PAIR_ID_MASK)
+    
+    _, term_offsets, term_postings = postings_from_pairs(merge_pairs(rekey(carried), sorted_unique(rekey(added_pairs))))
+    return FieldIndex(
+        gram_keys=gram_keys.astype(np.uint32),
+        gram_offsets=gram_offsets,
+        gram_postings=gram_postings,
+        terms=terms,
+        term_offsets=term_offsets,
+        term_postings=term_postings
+    )
+
+def build_index(columns: Mapping[str, NormalizedColumn], previous: Optional[Mapping[str, FieldIndex]] = None,
+                updates: Optional[Mapping[str, DictionaryUpdate]] = None) -> Dict[str, FieldIndex]:
+    """
+    Índice invertido de todos os campos de busca flexível.
+    Com `previous` e `updates` (de build_columns), atualiza o índice anterior
+    só com os conteúdos novos; senão constrói do zero.
+    """
+    index = {}
+    for field in TEXT_FIELDS:
+        if previous is None:
+            contents = columns[field].contents
+            update = DictionaryUpdate(
+                remap=np.empty(0, dtype=np.int64), added=contents, added_ids=np.arange(len(contents))
+            )
+            index[field] = update_field_index(None, update)
+        else:
+            index[field] = update_field_index(previous[field], updates[field])
+    return index
+
+@dataclass(frozen=True)
+class CodeIndex:
+    """
+    Índice código → posição do produto, construído a cada geração do catálogo.
+    `order` traz as posições em ordem crescente de (código em UTF-8, posição),
+    para busca binária em `codes`; vindos do snapshot binário, ambos apontam
+    para o mmap. Códigos repetidos apontam para a primeira ocorrência (como a
+    busca linear).
+    """
+    codes: Sequence[bytes]
+    order: np.ndarray
+    
+    def _range(self, code: str) -> Tuple[int, int]:
+        """Intervalo de `order` com as posições do código"""
+        key = code.encode("utf-8")
+        codes = self.codes
+        lo = bisect_left(self.order, key, key=lambda i: codes[i])
+        hi = lo
+        while hi < len(self.order) and codes[self.order[hi]] == key:
+            hi += 1
+        return lo, hi
+    
+    def get(self, code: str) -> Optional[int]:
+        """Posição do produto com o código (None se não existir)"""
+        lo, hi = self._range(code)
+        return int(self.order[lo]) if lo < hi else None
+    
+    def positions(self, codes: Iterable[str]) -> np.ndarray:
+        """Todas as posições dos produtos com algum dos códigos, em ordem crescente"""
+        found = [np.empty(0, dtype=np.int64)]
+        for code in codes:
+            lo, hi = self._range(code)
+            found.append(np.asarray(self.order[lo:hi], dtype=np.int64))
+        return np.sort(np.concatenate(found))
+
+def build_code_index(codes: Sequence[str]) -> CodeIndex:
+    """Constrói o índice de códigos (ordenação estável: empates ficam em ordem de posição)"""
+    encoded = tuple(code.encode("utf-8") for code in codes)
+    order = sorted(range(len(encoded)), key=encoded.__getitem__)
+    return CodeIndex(codes=encoded, order=np.array(order, dtype=np.int64))
+
+# =================== SNAPSHOT DO CATÁLOGO =======================
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """
+    Snapshot imutável do catálogo publicado por uma atualização.
+    Cada publicação recebe um número de geração crescente.
+    Os registros, colunas e índices podem estar em memória ou mapeados do
+    snapshot binário. `update` resume a diferença em relação à geração anterior.
+    """
+    generation: int
+    products: Sequence[Dict[str, Any]]
+    codes: Sequence[str]
+    digests: np.ndarray
+    columns: Dict[str, NormalizedColumn]
+    index: Dict[str, FieldIndex]
+    code_index: CodeIndex
+    prices: PriceColumn
+    simple_json: Sequence[bytes]
+    category_listing: EncodedPayload
+    full_stock: EncodedPayload
+    full_stock_simple: EncodedPayload
+    update: Optional[Dict[str, Any]]
+    updated_at: Optional[str]
+    loaded_at: str
+    source: str
+    binary_generation: Optional[int]
+
+def build_catalog_fields(products: List[Dict[str, Any]], previous: Optional[Mapping[str, Any]] = None,
+                         records: Optional[Sequence[bytes]] = None) -> Dict[str, Any]:
+    """
+    Estruturas derivadas do catálogo, inclusive o índice invertido.
+    Com `previous` (estruturas da geração anterior), calcula a diferença por
+    código e refaz só o trabalho dos registros novos ou alterados.
+    """
+    codes = tuple(str(p.get("codigo")) for p in products)
+    if records is None:
+        records = encode_records(products)
+    digests = record_digests(records)
+    
+    diff = None
+    if previous is not None:
+        diff = diff_catalog(previous["codes"], previous["digests"], codes, digests)
+    
+    if diff is None:
+        columns, _ = build_columns(products)
+        index = build_index(columns)
+        prices = build_price_column(products)
+        simple_json = build_simple_fragments(products)
+    else:
+        columns, updates = build_columns(products, previous["columns"], diff)
+        # Com diferença pequena em relação à geração anterior, o índice é atualizado
+        # por delta (os ids de conteúdo não dependem da posição dos registros)
+        if diff.incremental:
+            index = build_index(columns, previous["index"], updates)
+        else:
+            index = build_index(columns)
+        prices = build_price_column(products, previous["prices"], diff)
+        simple_json = build_simple_fragments(products, previous["simple_json"], diff)
+    
+    if diff is not None and listing_unchanged(previous["products"], products, diff.positions):
+        category_listing = previous["category_listing"]
+    else:
+        category_listing = build_category_listing(products)
+    
+    # Mesmos registros nas mesmas posições: os corpos do estoque completo não mudam
+    if diff is not None and len(diff.positions) == 0:
+        full_stock = previous["full_stock"]
+        full_stock_simple = previous["full_stock_simple"]
+    else:
+        full_stock = build_full_stock_payload(records, prices.order)
+        full_stock_simple = build_full_stock_payload(simple_json, prices.order)
+    
+    return {
+        "products": tuple(products),
+        "codes": codes,
+        "digests": digests,
+        "columns": columns,
+        "index": index,
+        "code_index": build_code_index(codes),
+        "prices": prices,
+        "simple_json": simple_json,
+        "category_listing": category_listing,
+        "full_stock": full_stock,
+        "full_stock_simple": full_stock_simple,
+        "update": diff.summary() if diff is not None else None
+    }
+
+# =================== SNAPSHOT BINÁRIO =======================
+
+# Payloads estáveis da geração guardados como blobs no snapshot binário
+BINARY_PAYLOADS = ["category_listing", "full_stock", "full_stock_simple"]
+
+def save_binary_catalog(path: str, products: List[Dict[str, Any]], updated_at: Optional[str],
+                        sources: Optional[Dict[str, Dict[str, Any]]] = None) -> int:
+    """
+    Grava o snapshot binário do catálogo (colunas de largura fixa, tabela de
+    strings com offsets e payloads pré-comprimidos), com os dicionários das
+    colunas normalizadas e os índices em arrays de largura fixa, prontos para
+    serem mapeados pelos workers.
+    O snapshot já gravado em `path` é a base da diferença: só registros novos ou
+    alterados são refeitos, sem manter a geração anterior em memória entre
+    gravações. `sources` (url → hash do conteúdo, início e quantidade dos seus
+    registros) vai para os metadados, para o fetcher reaproveitar os produtos
+    de fontes inalteradas sem guardá-los em memória. Retorna a geração gravada.
+    """
+    records = encode_records(products)
+    previous = None
+    if read_generation(path) is not None:
+        _, previous, _ = load_binary_catalog(path)
+    fields = build_catalog_fields(products, previous, records)
+    columns = fields["columns"]
+    index = fields["index"]
+    prices = fields["prices"]
+    generation = (read_generation(path) or 0) + 1
+    
+    string_columns = {
+        "record": records,
+        "simple": fields["simple_json"],
+        "code": fields["code_index"].codes
+    }
+    arrays = {
+        "price": prices.values,
+        "price_valid": prices.valid,
+        "price_order": prices.order,
+        "digest": fields["digests"],
+        "code_order": fields["code_index"].order
+    }
+    for field in SEARCH_FIELDS:
+        string_columns[f"content:{field}"] = columns[field].contents
+        arrays[f"content_ids:{field}"] = columns[field].ids
+    for field in TEXT_FIELDS:
+        field_index = index[field]
+        string_columns[f"term:{field}"] = field_index.terms
+        for name in ("gram_keys", "gram_offsets", "gram_postings", "term_offsets", "term_postings"):
+            arrays[f"{name}:{field}"] = getattr(field_index, name)
+    
+    blobs = {}
+    etags = {}
+    for name in BINARY_PAYLOADS:
+        payload = fields[name]
+        blobs[name] = payload.body
+        for encoding, body in payload.encoded.items():
+            blobs[f"{name}.{encoding}"] = body
+        etags[name] = payload.etag
+    
+    write_snapshot_file(
+        path,
+        generation,
+        meta={
+            "count": len(products),
+            "updated_at": updated_at,
+            "etags": etags,
+            "diff": fields["update"],
+            "sources": sources or {}
+        },
+        string_columns=string_columns,
+        arrays=arrays,
+        blobs=blobs
+    )
+    return generation
+
+class MappedProducts(Sequence):
+    """
+    Registros de produtos decodificados sob demanda a partir do snapshot binário.
+    `records` dá acesso ao JSON gravado de cada registro, sem decodificar.
+    """
+    
+    def __init__(self, records: StringColumn):
+        self.records = records
+    
+    def __len__(self) -> int:
+        return len(self.records)
+    
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [serializer.loads(record) for record in self.records[i]]
+        return serializer.loads(self.records[i])
+
+def load_source_products(path: str, url: str, digest: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Produtos de uma fonte lidos do snapshot binário, se ele foi gravado com o
+    mesmo conteúdo da fonte (hash); None se não há como reaproveitá-los
+    """
+    try:
+        snapshot_file = SnapshotFile(path)
+    except (OSError, ValueError):
+        return None
+    source = snapshot_file.meta.get("sources", {}).get(url)
+    if source is None or source["digest"] != digest:
+        return None
+    records = snapshot_file.strings("record", source["start"], source["start"] + source["count"])
+    return [serializer.loads(record) for record in records]
+
+class MappedTexts(Sequence):
+    """Coluna de texto do snapshot binário decodificada (UTF-8) sob demanda"""
+    
+    def __init__(self, column: StringColumn):
+        self.column = column
+    
+    def __len__(self) -> int:
+        return len(self.column)
+    
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [value.decode("utf-8") for value in self.column[i]]
+        return self.column[i].decode("utf-8")
+    
+    def __iter__(self) -> Iterator[str]:
+        for value in self.column:
+            yield value.decode("utf-8")
+
+def map_columns(snapshot_file: SnapshotFile) -> Dict[str, NormalizedColumn]:
+    """Colunas normalizadas apontando para o dicionário e os ids gravados no mmap"""
+    return {
+        field: NormalizedColumn(
+            contents=snapshot_file.strings(f"content:{field}"),
+            ids=snapshot_file.array(f"content_ids:{field}")
+        )
+        for field in SEARCH_FIELDS
+    }
+
+def map_index(snapshot_file: SnapshotFile) -> Dict[str, FieldIndex]:
+    """Índice invertido apontando para as listas CSR gravadas no mmap"""
+    return {
+        field: FieldIndex(
+            gram_keys=snapshot_file.array(f"gram_keys:{field}"),
+            gram_offsets=snapshot_file.array(f"gram_offsets:{field}"),
+            gram_postings=snapshot_file.array(f"gram_postings:{field}"),
+            terms=snapshot_file.strings(f"term:{field}"),
+            term_offsets=snapshot_file.array(f"term_offsets:{field}"),
+            term_postings=snapshot_file.array(f"term_postings:{field}")
+        )
+        for field in TEXT_FIELDS
+    }
+
+def load_binary_catalog(path: str) -> Tuple[int, Dict[str, Any], Optional[str]]:
+    """
+    Abre o snapshot binário com mmap, sem parse de JSON dos registros nem
+    reconstrução de colunas e índices: tudo aponta para as páginas do arquivo,
+    compartilhadas entre os processos pelo page cache.
+    Retorna (geração do arquivo, estruturas derivadas, data da atualização).
+    """
+    snapshot_file = SnapshotFile(path)
+    meta = snapshot_file.meta
+    codes = snapshot_file.strings("code")
+    
+    fields = {
+        "products": MappedProducts(snapshot_file.strings("record")),
+        "codes": MappedTexts(codes),
+        "digests": snapshot_file.array("digest"),
+        "columns": map_columns(snapshot_file),
+        "index": map_index(snapshot_file),
+        "code_index": CodeIndex(codes=codes, order=snapshot_file.array("code_order")),
+        "update": meta.get("diff"),
+        # Arrays de largura fixa apontam direto para as páginas do mmap
+        "prices": PriceColumn(
+            values=snapshot_file.array("price"),
+            valid=snapshot_file.array("price_valid"),
+            order=snapshot_file.array("price_order")
+        ),
+        "simple_json": snapshot_file.strings("simple")
+    }
+    
+    for name in BINARY_PAYLOADS:
+        encoded = {}
+        for encoding in ("gzip", "br"):
+            body = snapshot_file.blob(f"{name}.{encoding}")
+            if body is not None:
+                encoded[encoding] = body
+        fields[name] = EncodedPayload(
+            body=snapshot_file.blob(name),
+            etag=meta["etags"][name],
+            encoded=encoded
+        )
+    
+    return snapshot_file.generation, fields, meta.get("updated_at")
+
+@dataclass(frozen=True)
+class CatalogShard:
+    """
+    Fatia contígua [start, start + len(products)) do catálogo mapeada do snapshot
+    binário, para a busca distribuída em processos. As colunas são recortes dos
+    ids de conteúdo gravados e o índice é o do catálogo completo, também
+    mapeado (páginas compartilhadas com o servidor e os demais shards).
+    As posições locais somadas a `start` são as posições no catálogo completo.
+    """
+    generation: int
+    start: int
+    products: Sequence[Dict[str, Any]]
+    codes: Tuple[str, ...]
+    columns: Dict[str, NormalizedColumn]
+    index: Dict[str, FieldIndex]
+    code_index: CodeIndex
+    prices: PriceColumn
+
+def shard_bounds(count: int, shard: int, shard_count: int) -> Tuple[int, int]:
+    """Intervalo [start, stop) do shard `shard` entre `shard_count` fatias de tamanho equilibrado"""
+    return count * shard // shard_count, count * (shard + 1) // shard_count
+
+def shard_field_index(field_index: FieldIndex, column: NormalizedColumn) -> FieldIndex:
+    """
+    Índice do campo para um shard: as listas são as do índice completo e só o
+    vocabulário da busca aproximada fica restrito aos termos com algum
+    conteúdo presente na fatia (`column`)
+    """
+    if not len(field_index.terms):
+        return field_index
+    present = np.zeros(len(column.contents), dtype=bool)
+    present[column.ids[column.ids >= 0]] = True
+    # Todo termo tem ao menos um conteúdo: os offsets são estritamente crescentes
+    has_content = np.logical_or.reduceat(present[field_index.term_postings], field_index.term_offsets[:-1])
+    return replace(field_index, vocabulary_ids=np.flatnonzero(has_content))
+
+def load_binary_shard(path: str, shard: int, shard_count: int) -> CatalogShard:
+    """Mapeia o snapshot binário e recorta a fatia do shard (sem reconstruir colunas nem índice)"""
+    snapshot_file = SnapshotFile(path)
+    start, stop = shard_bounds(snapshot_file.string_count("record"), shard, shard_count)
+    
+    columns = {
+        field: NormalizedColumn(contents=column.contents, ids=column.ids[start:stop])
+        for field, column in map_columns(snapshot_file).items()
+    }
+    index = {
+        field: shard_field_index(field_index, columns[field])
+        for field, field_index in map_index(snapshot_file).items()
+    }
+    
+    codes = tuple(code.decode("utf-8") for code in snapshot_file.strings("code", start, stop))
+    values = snapshot_file.array("price")[start:stop]
+    return CatalogShard(
+        generation=snapshot_file.generation,
+        start=start,
+        products=MappedProducts(snapshot_file.strings("record", start, stop)),
+        codes=codes,
+        columns=columns,
+        index=index,
+        code_index=build_code_index(codes),
+        prices=PriceColumn(
+            values=values,
+            valid=snapshot_file.array("price_valid")[start:stop],
+            order=np.argsort(values, kind="stable")
+        )
+    )
+
+# =================== ARMAZENAMENTO DO CATÁLOGO =======================
+
+class CatalogStore:
+    """
+    Mantém o catálogo residente em memória do processo.
+    Escritores publicam um novo snapshot com troca atômica de referência;
+    leitores obtêm o snapshot atual uma única vez por requisição.
+    Com snapshot binário, os workers mapeiam o mesmo arquivo e trocam de
+    geração remapeando-o. Com `convert`, a partida a frio sem snapshot binário
+    em dia não constrói nada no processo: `convert()` grava o snapshot a
+    partir do arquivo JSON (em outro processo) e ele é só mapeado.
+    """
+    
+    def __init__(self, json_file: str, binary_file: Optional[str] = None,
+                 convert: Optional[Callable[[], Any]] = None):
+        self.json_file = json_file
+        self.binary_file = binary_file
+        self.convert = convert
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._generation = 0
+        self._binary_generation: Optional[int] = None
+        # Quando a fonte do snapshot publicado foi gravada (mtime do arquivo ou hora da publicação)
+        self._source_mtime: Optional[float] = None
+        self._lock = threading.Lock()
+        # Serializa a carga da partida a frio (requisições simultâneas carregam uma vez só)
+        self._load_lock = threading.Lock()
+    
+    def current(self) -> Optional[CatalogSnapshot]:
+        """Retorna o snapshot publicado (ou None se ainda não houver)"""
+        return self._snapshot
+    
+    def _publish_fields(self, fields: Dict[str, Any], updated_at: Optional[str], source: str,
+                        source_mtime: float, binary_generation: Optional[int] = None) -> CatalogSnapshot:
+        # Estruturas derivadas são construídas (ou mapeadas) fora do lock, antes da publicação
+        with self._lock:
+            self._generation += 1
+            snapshot = CatalogSnapshot(
+                generation=self._generation,
+                updated_at=updated_at,
+                loaded_at=datetime.now().isoformat(),
+                source=source,
+                binary_generation=binary_generation,
+                **fields
+            )
+            # Troca atômica: requisições em andamento continuam com o snapshot anterior
+            self._snapshot = snapshot
+            self._binary_generation = binary_generation
+            self._source_mtime = source_mtime
+        
+        return snapshot
+    
+    def publish(self, data: Dict, source: str = "refresh", source_mtime: Optional[float] = None) -> CatalogSnapshot:
+        """
+        Constrói um snapshot a partir do resultado do fetcher e o publica.
+        `source_mtime` é quando os dados foram gravados (padrão: agora).
+        """
+        products = data.get("produtos", [])
+        if not isinstance(products, list):
+            raise ValueError("Formato inválido: 'produtos' deve ser uma lista")
+        
+        previous = self._snapshot
+        fields = build_catalog_fields(products, vars(previous) if previous is not None else None)
+        if source_mtime is None:
+            source_mtime = time.time()
+        return self._publish_fields(fields, data.get("_updated_at"), source, source_mtime)
+    
+    def load_from_file(self) -> CatalogSnapshot:
+        """Carrega o arquivo de dados como fonte de partida a frio"""
+        source_mtime = os.path.getmtime(self.json_file)
+        data = serializer.load_file(self.json_file)
+        return self.publish(data, source="file", source_mtime=source_mtime)
+    
+    def load_binary(self) -> CatalogSnapshot:
+        """Mapeia o snapshot binário e o publica (colunas e índices já vêm prontos no arquivo)"""
+        source_mtime = os.path.getmtime(self.binary_file)
+        binary_generation, fields, updated_at = load_binary_catalog(self.binary_file)
+        return self._publish_fields(fields, updated_at, "binary", source_mtime, binary_generation)
+    
+    def reload_if_changed(self) -> Optional[CatalogSnapshot]:
+        """Remapeia o snapshot binário se outro processo gravou uma nova geração"""
+        if not self.binary_file:
+            return None
+        
+        binary_generation = read_generation(self.binary_file)
+        if binary_generation is None or binary_generation == self._binary_generation:
+            return None
+        
+        # Mesma regra de _binary_is_current: um binário mais antigo que a fonte do
+        # snapshot publicado (arquivo JSON ou resultado publicado em memória) é obsoleto
+        try:
+            if self._source_mtime is not None and os.path.getmtime(self.binary_file) < self._source_mtime:
+                return None
+        except OSError:
+            return None
+        
+        return self.load_binary()
+    
+    def _binary_is_current(self) -> bool:
+        """O snapshot binário existe e não é mais antigo que o arquivo JSON"""
+        if not self.binary_file or read_generation(self.binary_file) is None:
+            return False
+        if not os.path.exists(self.json_file):
+            return True
+        return os.path.getmtime(self.binary_file) >= os.path.getmtime(self.json_file)
+    
+    def get(self) -> Optional[CatalogSnapshot]:
+        """
+        Retorna o snapshot atual, carregando do disco apenas na partida a frio
+        (o snapshot binário, se estiver em dia; senão o arquivo JSON, convertido
+        por `convert` se houver). Retorna None se não houver snapshot nem arquivo de dados.
+        """
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+        
+        with self._load_lock:
+            # Outra requisição pode ter concluído a carga enquanto esta esperava
+            if self._snapshot is not None:
+                return self._snapshot
+            
+            if self._binary_is_current():
+                return self.load_binary()
+            if not os.path.exists(self.json_file):
+                return None
+            
+            if self.convert is not None:
+                self.convert()
+                return self.load_binary()
+            return self.load_from_file()
+    
+    def info(self) -> Dict[str, Any]:
+        """Informações do snapshot atual para o endpoint de status"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return {"generation": 0, "product_count": 0, "loaded_at": None, "source": None}
+        
+        return {
+            "generation": snapshot.generation,
+            "binary_generation": self._binary_generation,
+            "product_count": len(snapshot.products),
+            "updated_at": snapshot.updated_at,
+            "loaded_at": snapshot.loaded_at,
+            "source": snapshot.source,
+            # Tamanho da última atualização em relação à geração anterior
+            "update": snapshot.update
+        }
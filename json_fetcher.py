@@ -1,15 +1,63 @@
 import requests
+import hashlib
+import io
 import json
 import os
 import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from functools import lru_cache
+from itertools import chain, islice
+from typing import IO, Dict, Iterable, Iterator, List, Any, Optional, Set, Tuple, Union
 from abc import ABC, abstractmethod
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import serializer
+from catalog import load_source_products, save_binary_catalog
+
+try:
+    import ijson
+except ImportError:  # ijson é opcional: sem ele, o corpo da resposta é lido inteiro
+    ijson = None
 
 # =================== CONFIGURAÇÕES GLOBAIS =======================
 
 JSON_FILE = "produtos.json"
 
+# Snapshot binário (colunar, mapeado com mmap pelos workers)
+BINARY_FILE = "produtos.bin"
+
+# Grava o arquivo de dados indentado (útil para inspeção manual); compacto por padrão
+JSON_PRETTY = os.environ.get("JSON_PRETTY", "") == "1"
+
+# Busca concorrente das fontes: nº máximo de downloads simultâneos,
+# timeout padrão (s), tentativas extras e fator de backoff exponencial (s).
+# O timeout pode ser ajustado por fonte com FETCH_TIMEOUT_<VARIÁVEL>,
+# ex.: FETCH_TIMEOUT_JSON_URL_B=90
+FETCH_MAX_WORKERS = int(os.environ.get("FETCH_MAX_WORKERS", "4"))
+FETCH_TIMEOUT = float(os.environ.get("FETCH_TIMEOUT", "30"))
+FETCH_RETRIES = int(os.environ.get("FETCH_RETRIES", "2"))
+FETCH_BACKOFF = float(os.environ.get("FETCH_BACKOFF", "1.0"))
+
+# Status HTTP transitórios que disparam nova tentativa
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+# Leitura em streaming do JSON das fontes (item a item, com ijson), para não
+# manter corpo bruto + lista decodificada + lista processada ao mesmo tempo.
+# Ativa por padrão quando o ijson está instalado; FETCH_STREAMING=0 desliga.
+FETCH_STREAMING = os.environ.get("FETCH_STREAMING", "1") != "0" and ijson is not None
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Erros de formato JSON dos dois modos de leitura
+JSON_ERRORS = (json.JSONDecodeError,) + ((ijson.JSONError,) if ijson is not None else ())
+
+# Itens processados por lote no parse colunar
+PARSE_BATCH_SIZE = 1000
+
+# Sufixo de arquivo de imagem seguido de query string (?v=...), removida na normalização
+IMAGE_URL_SUFFIX = re.compile(r'(\.(png|jpg|jpeg|gif|webp|bmp|svg))(\?.*)?$', re.IGNORECASE)
+
 # Mapeamento de categorias
 MAPEAMENTO_CATEGORIAS = {
     "66": "confeitaria",
@@ -41,6 +89,19 @@ def safe_get(data: Dict, keys: List[str], default: Any = None) -> Any:
             return data[key]
     return default
 
+def clean_image_url(url: str) -> str:
+    """
+    Remove a query string após a extensão da imagem (mesmo efeito do
+    re.sub com IMAGE_URL_SUFFIX, sem expandir o template a cada URL).
+    Sem "?" não há o que remover.
+    """
+    if "?" not in url:
+        return url
+    match = IMAGE_URL_SUFFIX.search(url)
+    if match is None:
+        return url
+    return url[:match.start()] + match.group(1) + url[match.end():]
+
 def normalize_images(imagens_data: Any) -> List[str]:
     """
     Normaliza diferentes estruturas de imagens para uma lista simples de URLs.
@@ -70,7 +131,7 @@ def normalize_images(imagens_data: Any) -> List[str]:
         if url and url not in seen:
             # Limpa a URL: remove tudo depois da extensão do arquivo
             # Suporta: .png, .jpg, .jpeg, .gif, .webp, etc
-            clean_url = re.sub(r'(\.(png|jpg|jpeg|gif|webp|bmp|svg))(\?.*)?$', r'\1', url, flags=re.IGNORECASE)
+            clean_url = clean_image_url(url)
             
             seen.add(clean_url)
             normalized.append(clean_url)
@@ -82,7 +143,20 @@ def parse_categorias(categorias_str: Any) -> str:
     Converte códigos de categorias para nomes legíveis.
     Entrada: "[\"68\"]" ou "[\"68\", \"73\"]" ou "68"
     Saída: "condimentos molhos" ou "condimentos molhos, alimentício"
+    Strings e listas de strings são memoizadas (os valores se repetem muito no feed).
     """
+    if isinstance(categorias_str, str):
+        return decode_categorias_cached(categorias_str)
+    if isinstance(categorias_str, list) and all(type(codigo) is str for codigo in categorias_str):
+        return decode_categorias_cached(tuple(categorias_str))
+    return decode_categorias(categorias_str)
+
+@lru_cache(maxsize=4096)
+def decode_categorias_cached(categorias: Union[str, Tuple[str, ...]]) -> str:
+    return decode_categorias(list(categorias) if isinstance(categorias, tuple) else categorias)
+
+def decode_categorias(categorias_str: Any) -> str:
+    """Tradução dos códigos de categorias, sem memoização"""
     if not categorias_str:
         return ""
     
@@ -128,6 +202,23 @@ class BaseParser(ABC):
     @abstractmethod
     def parse(self, data: Any, url: str) -> List[Dict]: pass
     
+    @abstractmethod
+    def parse_item(self, item: Any) -> Optional[Dict]:
+        """Processa um único item da fonte (None descarta o item)"""
+    
+    def parse_batch(self, items: List[Any]) -> List[Dict]:
+        """Processa um lote de itens (parsers podem sobrescrever com uma versão colunar)"""
+        return [parsed for parsed in map(self.parse_item, items) if parsed is not None]
+    
+    def parse_stream(self, items: Iterable[Any], url: str) -> Iterator[Dict]:
+        """Processa os itens em lotes de PARSE_BATCH_SIZE, à medida que chegam"""
+        items = iter(items)
+        while True:
+            batch = list(islice(items, PARSE_BATCH_SIZE))
+            if not batch:
+                break
+            yield from self.parse_batch(batch)
+    
     def normalize_product(self, produto: Dict) -> Dict:
         # Aplica normalização nas imagens
         imagens = produto.get("imagens", [])
@@ -174,35 +265,68 @@ class ZettaBrasilParser(BaseParser):
             print(f"[AVISO] Dados não estão em formato de lista")
             return []
         
-        parsed_products = []
+        return list(self.parse_stream(data, url))
+    
+    def parse_item(self, item: Any) -> Optional[Dict]:
+        if not isinstance(item, dict):
+            return None
         
-        for item in data:
-            if not isinstance(item, dict):
-                continue
-            
-            # Filtra produtos excluídos
-            if item.get("excluido", False):
-                continue
-            
-            parsed = self.normalize_product({
-                "codigo": item.get("codigo"),
-                "nome": item.get("nome"),
-                "complemento": item.get("complemento"),
-                "marca": item.get("marca"),
-                "modelo": item.get("modelo"),
-                "preco": converter_preco(item.get("preco")),
-                "peso": float(item.get("peso", 0.0)),
-                "altura": float(item.get("altura", 0.0)),
-                "largura": float(item.get("largura", 0.0)),
-                "comprimento": float(item.get("comprimento", 0.0)),
-                "categorias": parse_categorias(item.get("categorias")),
-                "observacao": item.get("observacao", ""),
-                "imagens": item.get("imagens", [])
-            })
-            
-            parsed_products.append(parsed)
+        # Filtra produtos excluídos
+        if item.get("excluido", False):
+            return None
         
-        return parsed_products
+        return self.normalize_product({
+            "codigo": item.get("codigo"),
+            "nome": item.get("nome"),
+            "complemento": item.get("complemento"),
+            "marca": item.get("marca"),
+            "modelo": item.get("modelo"),
+            "preco": converter_preco(item.get("preco")),
+            "peso": float(item.get("peso", 0.0)),
+            "altura": float(item.get("altura", 0.0)),
+            "largura": float(item.get("largura", 0.0)),
+            "comprimento": float(item.get("comprimento", 0.0)),
+            "categorias": parse_categorias(item.get("categorias")),
+            "observacao": item.get("observacao", ""),
+            "imagens": item.get("imagens", [])
+        })
+    
+    def parse_batch(self, items: List[Any]) -> List[Dict]:
+        """
+        Parse colunar do lote: cada campo é convertido numa passada só sobre
+        os itens, e cada registro de saída é montado uma única vez (mesmo
+        resultado de parse_item, item a item).
+        """
+        rows = [item for item in items if isinstance(item, dict) and not item.get("excluido", False)]
+        
+        precos = [converter_preco(row.get("preco")) for row in rows]
+        pesos = [float(row.get("peso", 0.0)) for row in rows]
+        alturas = [float(row.get("altura", 0.0)) for row in rows]
+        larguras = [float(row.get("largura", 0.0)) for row in rows]
+        comprimentos = [float(row.get("comprimento", 0.0)) for row in rows]
+        categorias = [parse_categorias(row.get("categorias")) for row in rows]
+        imagens = [normalize_images(row.get("imagens", [])) for row in rows]
+        
+        return [
+            {
+                "codigo": row.get("codigo"),
+                "nome": row.get("nome"),
+                "complemento": row.get("complemento"),
+                "marca": row.get("marca"),
+                "modelo": row.get("modelo"),
+                "preco": preco,
+                "peso": peso,
+                "altura": altura,
+                "largura": largura,
+                "comprimento": comprimento,
+                "categorias": categoria,
+                "observacao": row.get("observacao", ""),
+                "imagens": imagem
+            }
+            for row, preco, peso, altura, largura, comprimento, categoria, imagem in zip(
+                rows, precos, pesos, alturas, larguras, comprimentos, categorias, imagens
+            )
+        ]
 
 # =================== SISTEMA PRINCIPAL =======================
 
@@ -211,11 +335,49 @@ class UnifiedProductFetcher:
         self.parsers = [
             ZettaBrasilParser()
         ]
+        self.session = self._build_session()
+        
+        # Estado por fonte para requisições condicionais: ETag, Last-Modified e
+        # hash do conteúdo da última leitura. Os produtos de fontes inalteradas
+        # são relidos do snapshot binário, não ficam em memória entre rodadas
+        self.sources: Dict[str, Dict[str, Any]] = {}
+        self.unchanged: Set[str] = set()
+        self.last_result: Optional[Dict] = None
+        self.last_urls: frozenset = frozenset()
         print("[INFO] Sistema de produtos iniciado")
     
+    def _build_session(self) -> requests.Session:
+        """Sessão HTTP compartilhada entre as fontes (pool de conexões + retry com backoff)"""
+        retry = Retry(
+            total=FETCH_RETRIES,
+            backoff_factor=FETCH_BACKOFF,
+            status_forcelist=RETRY_STATUS,
+            allowed_methods=frozenset(["GET"]),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=FETCH_MAX_WORKERS, pool_maxsize=FETCH_MAX_WORKERS, max_retries=retry)
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+    
     def get_urls(self) -> List[str]:
-        """Busca URLs das variáveis de ambiente JSON_URL*"""
-        return list({val for var, val in os.environ.items() if var.startswith("JSON_URL") and val})
+        """
+        Busca URLs das variáveis de ambiente JSON_URL*, na ordem dos nomes das variáveis
+        (sem repetição). A ordem é a mesma em todos os processos e reinícios, e com ela
+        a posição dos produtos no catálogo combinado.
+        """
+        urls = (val for var, val in sorted(os.environ.items()) if var.startswith("JSON_URL") and val)
+        return list(dict.fromkeys(urls))
+    
+    def get_timeout(self, url: str) -> float:
+        """Timeout da fonte: FETCH_TIMEOUT_<VARIÁVEL> se definido, senão FETCH_TIMEOUT"""
+        for var, val in os.environ.items():
+            if var.startswith("JSON_URL") and val == url:
+                timeout = os.environ.get(f"FETCH_TIMEOUT_{var}")
+                if timeout:
+                    return float(timeout)
+        return FETCH_TIMEOUT
     
     def select_parser(self, data: Any, url: str) -> Optional['BaseParser']:
         """Seleciona o parser apropriado baseado na URL e estrutura dos dados"""
@@ -227,31 +389,133 @@ class UnifiedProductFetcher:
         print(f"[ERRO] Nenhum parser encontrado para URL: {url}")
         return None
     
-    def process_url(self, url: str) -> List[Dict]:
+    def conditional_headers(self, state: Optional[Dict]) -> Dict[str, str]:
+        """Cabeçalhos de requisição condicional a partir dos validadores da última leitura"""
+        headers = {}
+        if state:
+            if state.get("etag"):
+                headers["If-None-Match"] = state["etag"]
+            if state.get("last_modified"):
+                headers["If-Modified-Since"] = state["last_modified"]
+        return headers
+    
+    def download(self, response: requests.Response) -> Tuple[IO[bytes], str]:
+        """
+        Lê o corpo da resposta calculando o hash do conteúdo.
+        No modo streaming o corpo vai em blocos para um arquivo temporário
+        (memória limitada); senão, fica em memória.
+        """
+        digest = hashlib.sha256()
+        if not FETCH_STREAMING:
+            content = response.content
+            digest.update(content)
+            return io.BytesIO(content), digest.hexdigest()
+        
+        body = tempfile.TemporaryFile()
+        try:
+            for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+                digest.update(chunk)
+                body.write(chunk)
+        except BaseException:
+            body.close()
+            raise
+        
+        body.seek(0)
+        return body, digest.hexdigest()
+    
+    def process_url(self, url: str, conditional: bool = True) -> Optional[List[Dict]]:
+        """
+        Baixa e processa uma fonte (com requisição condicional, se `conditional`).
+        Retorna None se a fonte não mudou desde a última leitura: os produtos
+        são os gravados no snapshot binário (ver source_products).
+        """
         print(f"[INFO] Processando URL: {url}")
+        state = self.sources.get(url) if conditional else None
         try:
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
+            with self.session.get(url, timeout=self.get_timeout(url), stream=True,
+                                  headers=self.conditional_headers(state)) as response:
+                if response.status_code == 304 and state is not None:
+                    print(f"[INFO] Fonte não modificada (304): {url}")
+                    self.unchanged.add(url)
+                    return None
+                
+                response.raise_for_status()
+                body, digest = self.download(response)
+                validators = {
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified")
+                }
             
-            data = response.json()
-            print(f"[INFO] JSON carregado com sucesso")
+            with body:
+                if state is not None and state["digest"] == digest:
+                    # Servidor sem validadores (ou que os ignora), mas o conteúdo é o mesmo
+                    print(f"[INFO] Conteúdo inalterado (mesmo hash): {url}")
+                    self.unchanged.add(url)
+                    products = None
+                else:
+                    products = self.parse_body(body, url)
             
-            parser = self.select_parser(data, url)
-            if parser:
-                return parser.parse(data, url)
-            else:
-                print(f"[ERRO] Nenhum parser adequado encontrado para URL: {url}")
-                return []
+            self.sources[url] = {**validators, "digest": digest}
+            return products
                 
         except requests.RequestException as e:
             print(f"[ERRO] Erro de requisição para URL {url}: {e}")
-            return []
-        except json.JSONDecodeError as e:
+        except JSON_ERRORS as e:
             print(f"[ERRO] Erro ao decodificar JSON da URL {url}: {e}")
-            return []
         except Exception as e:
             print(f"[ERRO] Erro crítico ao processar URL {url}: {e}")
+        
+        # A fonte entra vazia nesta rodada; sem estado, a próxima leitura é
+        # incondicional (o snapshot gravado não terá os produtos dela)
+        self.sources.pop(url, None)
+        return []
+    
+    def source_products(self, url: str) -> List[Dict]:
+        """
+        Produtos de uma fonte inalterada, lidos do snapshot binário. Se o snapshot
+        não os tem (ou foi gravado com outro conteúdo), baixa a fonte de novo
+        sem requisição condicional.
+        """
+        products = load_source_products(BINARY_FILE, url, self.sources[url]["digest"])
+        if products is not None:
+            return products
+        print(f"[INFO] Produtos da fonte fora do snapshot binário; baixando de novo: {url}")
+        return self.process_url(url, conditional=False)
+    
+    def parse_body(self, body: IO[bytes], url: str) -> List[Dict]:
+        """Decodifica o corpo baixado e o processa com o parser adequado"""
+        if FETCH_STREAMING:
+            return self.parse_body_stream(body, url)
+        
+        data = serializer.loads(body.read())
+        print(f"[INFO] JSON carregado com sucesso")
+        
+        parser = self.select_parser(data, url)
+        if parser:
+            return parser.parse(data, url)
+        else:
+            print(f"[ERRO] Nenhum parser adequado encontrado para URL: {url}")
+            return []
+    
+    def parse_body_stream(self, body: IO[bytes], url: str) -> List[Dict]:
+        """
+        Processa os itens do array um a um (ijson), sem materializar
+        a lista decodificada.
+        """
+        items = ijson.items(body, "item", use_float=True, buf_size=STREAM_CHUNK_SIZE)
+        first = next(items, None)
+        if first is None:
+            print(f"[AVISO] Nenhum item encontrado na URL: {url}")
             return []
+        
+        # O parser é escolhido pela URL ou pelo primeiro item
+        parser = self.select_parser([first], url)
+        if not parser:
+            print(f"[ERRO] Nenhum parser adequado encontrado para URL: {url}")
+            return []
+        
+        print("[INFO] Lendo JSON em streaming")
+        return list(parser.parse_stream(chain([first], items), url))
     
     def fetch_all(self) -> Dict:
         urls = self.get_urls()
@@ -260,7 +524,32 @@ class UnifiedProductFetcher:
             return {}
         
         print(f"[INFO] {len(urls)} URL(s) encontrada(s) para processar")
-        all_products = [product for url in urls for product in self.process_url(url)]
+        self.unchanged = set()
+        
+        # Fontes baixadas em paralelo; map preserva a ordem das URLs no resultado
+        with ThreadPoolExecutor(max_workers=max(1, min(FETCH_MAX_WORKERS, len(urls)))) as executor:
+            results = list(executor.map(self.process_url, urls))
+        
+        # Nenhuma fonte mudou desde a última gravação: arquivos e catálogo continuam válidos
+        if self.last_result is not None and self.last_urls == frozenset(urls) and self.unchanged.issuperset(urls):
+            print("[OK] Nenhuma fonte foi alterada; catálogo atual mantido")
+            return {**self.last_result, "_unchanged": True}
+        
+        # Fontes inalteradas (mas não todas): produtos relidos do snapshot em disco
+        results = [
+            products if products is not None else self.source_products(url)
+            for url, products in zip(urls, results)
+        ]
+        all_products = [product for products in results for product in products]
+        
+        # Onde estão os produtos de cada fonte no snapshot, com o hash do conteúdo lido
+        sources = {}
+        start = 0
+        for url, products in zip(urls, results):
+            state = self.sources.get(url)
+            if state is not None:
+                sources[url] = {"digest": state["digest"], "start": start, "count": len(products)}
+            start += len(products)
         
         # Estatísticas
         stats = self._generate_stats(all_products)
@@ -273,13 +562,30 @@ class UnifiedProductFetcher:
             "_statistics": stats
         }
         
+        saved = True
         try:
-            with open(JSON_FILE, "w", encoding="utf-8") as f:
-                json.dump(result, f, ensure_ascii=False, indent=2)
+            serializer.dump_file(result, JSON_FILE, pretty=JSON_PRETTY)
             print(f"\n[OK] Arquivo {JSON_FILE} salvo com sucesso!")
         except Exception as e:
+            saved = False
             print(f"[ERRO] Erro ao salvar arquivo JSON: {e}")
         
+        try:
+            result["_binary_generation"] = save_binary_catalog(
+                BINARY_FILE, all_products, result["_updated_at"], sources
+            )
+            print(f"[OK] Snapshot binário {BINARY_FILE} salvo (geração {result['_binary_generation']})")
+        except Exception as e:
+            saved = False
+            print(f"[ERRO] Erro ao salvar snapshot binário: {e}")
+        
+        # Só permite pular a próxima atualização se os arquivos refletem este resultado
+        if saved:
+            self.last_result = {key: value for key, value in result.items() if key != "produtos"}
+            self.last_urls = frozenset(urls)
+        else:
+            self.last_result = None
+        
         print(f"[OK] Total de produtos processados: {len(all_products)}")
         self._print_stats(stats)
         return result
@@ -355,10 +661,36 @@ class UnifiedProductFetcher:
 
 # =================== FUNÇÃO PARA IMPORTAÇÃO =======================
 
+# Instância mantida entre atualizações (validadores e hash de cada fonte)
+_fetcher: Optional[UnifiedProductFetcher] = None
+
 def fetch_and_convert_json():
     """Função de alto nível para ser importada por outros módulos."""
-    fetcher = UnifiedProductFetcher()
-    return fetcher.fetch_all()
+    global _fetcher
+    if _fetcher is None:
+        _fetcher = UnifiedProductFetcher()
+    return _fetcher.fetch_all()
+
+def refresh_snapshot() -> Dict:
+    """
+    Atualização para rodar em processo separado: grava os arquivos de dados
+    e devolve só os metadados (os produtos ficam no snapshot em disco, sem
+    voltar serializados para o processo do servidor).
+    """
+    result = fetch_and_convert_json()
+    return {key: value for key, value in result.items() if key != "produtos"}
+
+def convert_snapshot() -> int:
+    """
+    Partida a frio para rodar em processo separado: grava o snapshot binário a
+    partir do arquivo de dados já salvo, para o servidor só mapeá-lo.
+    Retorna a geração gravada.
+    """
+    data = serializer.load_file(JSON_FILE)
+    products = data.get("produtos", [])
+    if not isinstance(products, list):
+        raise ValueError("Formato inválido: 'produtos' deve ser uma lista")
+    return save_binary_catalog(BINARY_FILE, products, data.get("_updated_at"))
 
 # =================== EXECUÇÃO PRINCIPAL =======================
 
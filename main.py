@@ -1,20 +1,88 @@
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse, PlainTextResponse
-from unidecode import unidecode
-from rapidfuzz import fuzz
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from rapidfuzz import fuzz, process
 from apscheduler.schedulers.background import BackgroundScheduler
-from json_fetcher import fetch_and_convert_json
+from json_fetcher import fetch_and_convert_json, refresh_snapshot, convert_snapshot, JSON_FILE, BINARY_FILE
+import serializer
+from catalog import (
+    CatalogShard, CatalogStore, CatalogSnapshot, EncodedPayload, MappedProducts, normalize_text, convert_price,
+    byte_ngrams, encode_json, load_binary_shard, brotli
+)
+import asyncio
+import gzip
 import json
+import multiprocessing
 import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Any, Tuple
 from dataclasses import dataclass
+import numpy as np
 
-app = FastAPI()
+class FastJSONResponse(JSONResponse):
+    """JSONResponse serializado pela camada de serialização (orjson quando disponível)"""
+    
+    def render(self, content: Any) -> bytes:
+        return serializer.dumps(content)
+
+app = FastAPI(default_response_class=FastJSONResponse)
 
 # Arquivo para armazenar status da última atualização
 STATUS_FILE = "last_update_status.json"
 
+# Intervalo (segundos) para verificar se há nova geração do snapshot binário
+BINARY_POLL_SECONDS = int(os.environ.get("BINARY_POLL_SECONDS", "30"))
+
+# Intervalo (horas) entre atualizações agendadas dos dados
+REFRESH_INTERVAL_HOURS = 2
+
+# Onde roda o pipeline de atualização: "thread" (no processo do servidor) ou
+# "process" (processo dedicado; o servidor só mapeia o snapshot binário pronto)
+REFRESH_EXECUTOR = os.environ.get("REFRESH_EXECUTOR", "thread")
+
+# Idade máxima (segundos) dos dados para o endpoint de prontidão responder 200;
+# 0 desativa o limite (só exige que haja catálogo carregado)
+READY_MAX_AGE_SECONDS = int(os.environ.get("READY_MAX_AGE_SECONDS", "0"))
+
+# Tamanho padrão da página de resultados de busca
+SEARCH_PAGE_SIZE = 20
+
+# Produtos por bloco enviado no modo streaming (formato=ndjson)
+NDJSON_CHUNK_SIZE = 200
+
+# Respostas dinâmicas a partir deste tamanho (bytes) são comprimidas na hora
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", "1024"))
+
+# Compressões disponíveis para respostas dinâmicas (brotli é opcional)
+DYNAMIC_ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+# Quantidade máxima de respostas de busca mantidas em cache
+SEARCH_CACHE_SIZE = int(os.environ.get("SEARCH_CACHE_SIZE", "1024"))
+
+# Processos de busca distribuída: o catálogo é dividido em SEARCH_SHARDS fatias,
+# cada uma mapeada do snapshot binário (colunas e índice já gravados) por um processo; 0 desativa
+SEARCH_SHARDS = int(os.environ.get("SEARCH_SHARDS", "0"))
+
+# Threads dedicadas à busca e buscas que podem aguardar na fila além delas;
+# acima disso a requisição recebe 503 com Retry-After em vez de esperar
+SEARCH_WORKERS = int(os.environ.get("SEARCH_WORKERS", "4"))
+SEARCH_QUEUE_LIMIT = int(os.environ.get("SEARCH_QUEUE_LIMIT", "16"))
+
+# Segundos sugeridos no Retry-After das respostas de sobrecarga
+SEARCH_RETRY_AFTER = int(os.environ.get("SEARCH_RETRY_AFTER", "1"))
+
+# Orçamento de tempo (ms) de cada busca, contado desde a chegada da requisição;
+# esgotado, a busca é refeita sem o nível rapidfuzz (modo degradado). 0 desativa
+SEARCH_TIME_BUDGET_MS = int(os.environ.get("SEARCH_TIME_BUDGET_MS", "0"))
+
+# Máximo de códigos por consulta em lote (/api/produtos)
+BATCH_MAX_CODES = int(os.environ.get("BATCH_MAX_CODES", "1000"))
+
 # Configuração de prioridades para fallback (do menos importante para o mais importante)
 FALLBACK_PRIORITY = [
     "observacao",     # Primeiro a ser removido
@@ -27,17 +95,186 @@ FALLBACK_PRIORITY = [
 
 @dataclass
 class SearchResult:
-    """Resultado de uma busca com informações de fallback"""
-    products: List[Dict[str, Any]]
+    """
+    Resultado de uma busca com informações de fallback.
+    `product_ids` são as posições da página no snapshot buscado; os registros
+    só são lidos ao montar a resposta.
+    """
     total_found: int
     fallback_info: Dict[str, Any]
     removed_filters: List[str]
+    product_ids: List[int]
+    degraded: bool = False
+
+class SearchBudgetExceeded(Exception):
+    """O orçamento de tempo da busca se esgotou"""
+
+@dataclass(frozen=True)
+class SearchBudget:
+    """
+    Prazo de uma busca (relógio monotônico, comum a todos os processos da máquina).
+    Sem `deadline` nunca se esgota; `degraded` desliga o nível rapidfuzz.
+    """
+    deadline: Optional[float] = None
+    degraded: bool = False
+    
+    @classmethod
+    def from_ms(cls, budget_ms: int) -> "SearchBudget":
+        return cls(deadline=time.monotonic() + budget_ms / 1000 if budget_ms > 0 else None)
+    
+    def check(self):
+        """Interrompe a busca (SearchBudgetExceeded) se o prazo passou"""
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise SearchBudgetExceeded()
+
+def select_top_k(keys: np.ndarray, k: Optional[int] = None) -> np.ndarray:
+    """
+    Posições dos k menores valores de `keys`, em ordem crescente.
+    Empates mantêm a ordem original, como numa ordenação estável completa,
+    mas só os k selecionados (via argpartition) são ordenados.
+    """
+    if k is None or len(keys) <= k:
+        return np.argsort(keys, kind="stable")
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    
+    kth_value = keys[np.argpartition(keys, k - 1)[:k]].max()
+    if np.isnan(kth_value):
+        return np.argsort(keys, kind="stable")[:k]
+    
+    # Todos abaixo do k-ésimo valor, completando com os empates na ordem original
+    below = np.flatnonzero(keys < kth_value)
+    ties = np.flatnonzero(keys == kth_value)[:k - len(below)]
+    selected = np.sort(np.concatenate([below, ties]))
+    return selected[np.argsort(keys[selected], kind="stable")]
+
+class SearchCache:
+    """
+    Cache LRU de resultados de busca.
+    A chave inclui a geração do catálogo, então cada atualização invalida as entradas antigas.
+    O resultado guardado serve tanto à resposta completa quanto à simples.
+    """
+    
+    def __init__(self, max_entries: int = SEARCH_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, SearchResult]" = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def make_key(self, generation: int, filters: Dict[str, str], precomax: Optional[str],
+                 excluded_ids: set, offset: int = 0, limit: Optional[int] = None) -> Tuple:
+        """Chave canônica: independe da ordem dos filtros e dos códigos excluídos"""
+        return (
+            generation,
+            tuple(sorted((k, v.strip()) for k, v in filters.items())),
+            precomax,
+            tuple(sorted(excluded_ids)),
+            offset,
+            limit
+        )
+    
+    def get(self, key: Tuple) -> Optional[SearchResult]:
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+    
+    def put(self, key: Tuple, result: SearchResult):
+        if self.max_entries <= 0:
+            return
+        
+        with self._lock:
+            # Nova geração do catálogo: descarta as respostas da geração anterior
+            generation = key[0]
+            if generation > self._generation:
+                self.evictions += len(self._entries)
+                self._entries.clear()
+                self._generation = generation
+            elif generation < self._generation:
+                return
+            
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        """Contadores expostos no endpoint de status"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "generation": self._generation,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+class SearchOverloaded(Exception):
+    """A fila do executor de busca está cheia"""
+
+class SearchExecutor:
+    """
+    Executor dedicado às buscas, separado do threadpool que atende as requisições.
+    Admite no máximo `max_workers + max_queue` buscas em andamento ou na fila;
+    além disso rejeita na hora com SearchOverloaded, sem enfileirar.
+    """
+    
+    def __init__(self, max_workers: int = SEARCH_WORKERS, max_queue: int = SEARCH_QUEUE_LIMIT):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="search")
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.rejected = 0
+    
+    def _release(self, future: Future):
+        with self._lock:
+            self._pending -= 1
+            self.completed += 1
+    
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Executa `fn(*args)` no executor e aguarda o resultado sem bloquear o loop de eventos"""
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise SearchOverloaded()
+            self._pending += 1
+        
+        # A vaga é liberada quando a busca termina, mesmo que o cliente desista antes
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Contadores expostos no endpoint de status"""
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "pending": self._pending,
+                "completed": self.completed,
+                "rejected": self.rejected
+            }
 
 class ProductSearchEngine:
     """Engine de busca de produtos com sistema de fallback inteligente"""
     
     def __init__(self):
         self.exact_fields = ["codigo"]
+        # Campos com busca flexível (exato → fuzzy)
+        self.text_fields = ["nome", "marca", "categorias", "modelo", "complemento", "observacao"]
         # Thresholds mais baixos para campos principais (mais flexível)
         self.fuzzy_thresholds = {
             "nome": 75,        # Muito flexível para nomes
@@ -48,22 +285,20 @@ class ProductSearchEngine:
         
     def normalize_text(self, text: str) -> str:
         """Normaliza texto para comparação"""
-        if not text:
-            return ""
-        return unidecode(str(text)).lower().replace("-", "").replace(" ", "").strip()
+        return normalize_text(text)
+    
+    def normalize_query_words(self, query_words: List[str]) -> List[str]:
+        """Normaliza as palavras da query, descartando as muito curtas"""
+        normalized_words = []
+        for word in query_words:
+            normalized_word = self.normalize_text(word)
+            if len(normalized_word) >= 2:
+                normalized_words.append(normalized_word)
+        return normalized_words
     
     def convert_price(self, price_str: Any) -> Optional[float]:
         """Converte string de preço para float"""
-        if not price_str:
-            return None
-        try:
-            if isinstance(price_str, (int, float)):
-                return float(price_str)
-            
-            cleaned = str(price_str).replace(",", ".").replace("R$", "").strip()
-            return float(cleaned)
-        except (ValueError, TypeError):
-            return None
+        return convert_price(price_str)
     
     def get_max_value_from_range_param(self, param_value: str) -> str:
         """Extrai o maior valor de parâmetros de range que podem ter múltiplos valores"""
@@ -80,131 +315,141 @@ class ProductSearchEngine:
         
         return param_value
     
-    def exact_match(self, query_words: List[str], field_content: str) -> Tuple[bool, str]:
-        """Busca exata: todas as palavras devem estar presentes (substring)"""
-        if not query_words or not field_content:
-            return False, "empty_input"
-            
-        normalized_content = self.normalize_text(field_content)
+    def substring_match(self, catalog: CatalogSnapshot, field_name: str, normalized_word: str) -> np.ndarray:
+        """
+        Conteúdos distintos do campo que contêm a palavra (substring), como
+        máscara por id de conteúdo. Responde pelo índice de n-gramas: interseção
+        das listas de cada trigrama da palavra, seguida de verificação no conteúdo.
+        """
+        column = catalog.columns[field_name]
+        field_index = catalog.index[field_name]
+        word = normalized_word.encode("utf-8")
+        matched = np.zeros(len(column.contents), dtype=bool)
         
-        for word in query_words:
-            normalized_word = self.normalize_text(word)
-            if len(normalized_word) < 2:
-                continue
-                
-            if normalized_word not in normalized_content:
-                return False, f"exact_miss: '{normalized_word}' não encontrado"
+        if len(word) == 2:
+            matched[field_index.gram(word)] = True
+            return matched
+        
+        postings = []
+        for gram in byte_ngrams(word, 3):
+            ids = field_index.gram(gram)
+            if not len(ids):
+                return matched
+            postings.append(ids)
         
-        return True, f"exact_match: todas as palavras encontradas"
+        # Listas ordenadas: parte da menor e mantém os ids presentes nas demais
+        postings.sort(key=len)
+        candidates = postings[0]
+        for ids in postings[1:]:
+            at = np.minimum(np.searchsorted(ids, candidates), len(ids) - 1)
+            candidates = candidates[ids[at] == candidates]
+        
+        contents = column.contents
+        matched[[i for i in candidates.tolist() if word in contents[i]]] = True
+        return matched
     
-    def fuzzy_match(self, query_words: List[str], field_content: str, field_name: str = "default") -> Tuple[bool, str]:
+    def vocabulary_match(self, catalog: CatalogSnapshot, field_name: str, normalized_word: str,
+                         budget: Optional[SearchBudget] = None) -> np.ndarray:
         """
-        Verifica se há match fuzzy entre as palavras da query e o conteúdo do campo.
-        Usa threshold específico por campo para maior flexibilidade em campos principais.
+        Conteúdos do campo com termo do vocabulário similar à palavra (máscara por
+        id de conteúdo). A palavra é pontuada uma única vez contra o vocabulário
+        deduplicado (ratio e partial_ratio em lote) e os termos aprovados são
+        mapeados de volta para os conteúdos.
+        Com `budget`, o prazo é verificado antes de cada lote; no modo degradado
+        nenhum termo é pontuado.
         """
-        if not query_words or not field_content:
-            return False, "empty_input"
+        matched = np.zeros(len(catalog.columns[field_name].contents), dtype=bool)
+        if budget is not None and budget.degraded:
+            return matched
         
-        normalized_content = self.normalize_text(field_content)
+        field_index = catalog.index[field_name]
         fuzzy_threshold = self.fuzzy_thresholds.get(field_name, self.fuzzy_thresholds["default"])
         
-        matched_words = []
-        match_details = []
+        for scorer in (fuzz.ratio, fuzz.partial_ratio):
+            if budget is not None:
+                budget.check()
+            for _, _, term_id in process.extract(
+                normalized_word, field_index.vocabulary,
+                scorer=scorer, limit=None, score_cutoff=fuzzy_threshold
+            ):
+                matched[field_index.term(term_id)] = True
         
-        for word in query_words:
-            normalized_word = self.normalize_text(word)
-            if len(normalized_word) < 2:
-                continue
-            
-            word_matched = False
-            
-            # NÍVEL 1: Match exato (substring)
-            if normalized_word in normalized_content:
-                matched_words.append(normalized_word)
-                match_details.append(f"exact:{normalized_word}")
-                word_matched = True
-                continue
-            
-            # NÍVEL 2: Match no início da palavra
-            if not word_matched:
-                content_words = normalized_content.split()
-                for content_word in content_words:
-                    if content_word.startswith(normalized_word):
-                        matched_words.append(normalized_word)
-                        match_details.append(f"starts_with:{normalized_word}")
-                        word_matched = True
-                        break
-            
-            # NÍVEL 3: Substring match em palavras individuais
-            if not word_matched and len(normalized_word) >= 3:
-                content_words = normalized_content.split()
-                for content_word in content_words:
-                    if normalized_word in content_word:
-                        matched_words.append(normalized_word)
-                        match_details.append(f"substring:{normalized_word}>{content_word}")
-                        word_matched = True
-                        break
-            
-            # NÍVEL 4: Fuzzy match (similaridade fonética/ortográfica)
-            if not word_matched and len(normalized_word) >= 3:
-                # Testa contra o conteúdo completo
-                partial_score = fuzz.partial_ratio(normalized_content, normalized_word)
-                ratio_score = fuzz.ratio(normalized_content, normalized_word)
-                
-                # Testa também contra palavras individuais
-                word_scores = []
-                content_words = normalized_content.split()
-                for content_word in content_words:
-                    if len(content_word) >= 3:
-                        word_score = max(
-                            fuzz.ratio(content_word, normalized_word),
-                            fuzz.partial_ratio(content_word, normalized_word)
-                        )
-                        word_scores.append((word_score, content_word))
-                
-                max_score = max(partial_score, ratio_score)
-                
-                # Se encontrou boa correspondência em palavra individual
-                if word_scores:
-                    best_word_score, best_word = max(word_scores, key=lambda x: x[0])
-                    if best_word_score > max_score:
-                        max_score = best_word_score
-                        match_details.append(f"fuzzy_word:{normalized_word}~{best_word}({max_score})")
-                    else:
-                        match_details.append(f"fuzzy:{normalized_word}({max_score})")
-                else:
-                    match_details.append(f"fuzzy:{normalized_word}({max_score})")
-                
-                if max_score >= fuzzy_threshold:
-                    matched_words.append(normalized_word)
-                    word_matched = True
+        return matched
+    
+    def exact_match(self, query_words: List[str], substring_sets: Dict[str, np.ndarray],
+                    candidates: np.ndarray) -> np.ndarray:
+        """Busca exata: todas as palavras devem estar presentes (substring)"""
+        matched = candidates.copy()
+        for normalized_word in query_words:
+            matched &= substring_sets[normalized_word]
+        return matched
+    
+    def fuzzy_match(self, catalog: CatalogSnapshot, query_words: List[str], substring_sets: Dict[str, np.ndarray],
+                    candidates: np.ndarray, field_name: str = "default",
+                    budget: Optional[SearchBudget] = None) -> np.ndarray:
+        """
+        Verifica se há match fuzzy entre as palavras da query e o conteúdo do campo.
+        Usa threshold específico por campo para maior flexibilidade em campos principais.
+        
+        Os níveis exato, início de palavra e substring são respondidos pelas máscaras
+        do índice (como o conteúdo normalizado não tem espaços, início de palavra e
+        substring em palavra implicam substring no conteúdo). O nível rapidfuzz
+        pontua cada palavra contra o vocabulário do campo, não produto a produto.
+        """
+        if not query_words or not candidates.any():
+            return np.zeros_like(candidates)
         
         # Para campos principais (nome, marca, categorias): basta 1 palavra ter match
-        # Para outros campos: todas as palavras devem ter match
         if field_name in ["nome", "marca", "categorias"]:
-            if len(matched_words) >= 1:
-                return True, f"fuzzy_flexible: {', '.join(match_details)}"
-        else:
-            if len(matched_words) >= len([w for w in query_words if len(self.normalize_text(w)) >= 2]):
-                return True, f"fuzzy_strict: {', '.join(match_details)}"
+            matched = np.zeros_like(candidates)
+            for normalized_word in query_words:
+                # NÍVEIS 1-3: substring
+                matched |= substring_sets[normalized_word] & candidates
+                
+                # NÍVEL 4: Fuzzy match (similaridade fonética/ortográfica)
+                if len(normalized_word) >= 3:
+                    matched |= self.vocabulary_match(catalog, field_name, normalized_word, budget) & candidates
+            
+            return matched
         
-        return False, f"no_match: {', '.join(match_details) if match_details else 'nenhuma correspondência'}"
+        # Para outros campos: todas as palavras devem ter match
+        matched = candidates.copy()
+        for normalized_word in query_words:
+            word_matched = substring_sets[normalized_word]
+            
+            if len(normalized_word) >= 3:
+                word_matched = word_matched | self.vocabulary_match(catalog, field_name, normalized_word, budget)
+            
+            matched &= word_matched
+            if not matched.any():
+                break
+        
+        return matched
     
-    def field_match(self, query_words: List[str], field_content: str, field_name: str = "default") -> Tuple[bool, str]:
-        """Busca em três níveis: Exato → Fuzzy → Falha"""
+    def field_match(self, catalog: CatalogSnapshot, query_words: List[str], field_name: str = "default",
+                    budget: Optional[SearchBudget] = None) -> np.ndarray:
+        """
+        Busca em três níveis: Exato → Fuzzy → Falha.
+        Os níveis são avaliados sobre os conteúdos distintos do campo (o resultado
+        só depende do conteúdo); a máscara aprovada é expandida para as posições
+        dos produtos no final. Conteúdo vazio nunca é aprovado.
+        """
+        column = catalog.columns[field_name]
+        candidates = np.ones(len(column.contents), dtype=bool)
+        
+        substring_sets = {
+            normalized_word: self.substring_match(catalog, field_name, normalized_word)
+            for normalized_word in query_words
+        }
         
         # NÍVEL 1: Busca exata
-        exact_result, exact_reason = self.exact_match(query_words, field_content)
-        if exact_result:
-            return True, f"EXACT: {exact_reason}"
+        matched = self.exact_match(query_words, substring_sets, candidates)
         
         # NÍVEL 2: Busca fuzzy (com threshold específico por campo)
-        fuzzy_result, fuzzy_reason = self.fuzzy_match(query_words, field_content, field_name)
-        if fuzzy_result:
-            return True, f"FUZZY: {fuzzy_reason}"
+        matched |= self.fuzzy_match(catalog, query_words, substring_sets, candidates & ~matched, field_name, budget)
         
         # NÍVEL 3: Falha (vai para fallback)
-        return False, f"NO_MATCH: exact({exact_reason}) + fuzzy({fuzzy_reason})"
+        return column.expand(matched)
     
     def split_multi_value(self, value: str) -> List[str]:
         """Divide valores múltiplos separados por vírgula"""
@@ -212,200 +457,366 @@ class ProductSearchEngine:
             return []
         return [v.strip() for v in str(value).split(',') if v.strip()]
     
-    def apply_filters(self, products: List[Dict], filters: Dict[str, str]) -> List[Dict]:
-        """Aplica filtros aos produtos"""
-        if not filters:
-            return products
+    def filter_match(self, catalog: CatalogSnapshot, filter_key: str, filter_value: str,
+                     budget: Optional[SearchBudget] = None) -> Optional[np.ndarray]:
+        """
+        Máscara (por posição) dos produtos do catálogo aprovados por um único filtro
+        (None se o filtro é ignorado)
+        """
+        if filter_key in self.text_fields:
+            # Busca flexível nos campos de texto (nome, marca, categorias...)
+            multi_values = self.split_multi_value(filter_value)
+            all_words = []
+            for val in multi_values:
+                all_words.extend(val.split())
+            
+            if not all_words:
+                return np.zeros(len(catalog.products), dtype=bool)
             
-        filtered_products = list(products)
+            query_words = self.normalize_query_words(all_words)
+            return self.field_match(catalog, query_words, filter_key, budget)
         
+        if filter_key in self.exact_fields:
+            # Busca exata para código
+            normalized_values = set(
+                self.normalize_text(v) for v in self.split_multi_value(filter_value)
+            )
+            column = catalog.columns[filter_key]
+            matched = np.zeros(len(column.contents), dtype=bool)
+            for value in normalized_values:
+                content_id = column.find(value)
+                if content_id >= 0:
+                    matched[content_id] = True
+            found = column.expand(matched)
+            if "" in normalized_values:
+                found |= column.ids < 0
+            return found
+        
+        return None
+    
+    def filter_match_sets(self, catalog: CatalogSnapshot, filters: Dict[str, str],
+                          budget: Optional[SearchBudget] = None) -> Dict[str, np.ndarray]:
+        """Calcula uma única vez por requisição a máscara de produtos de cada filtro"""
+        match_sets = {}
         for filter_key, filter_value in filters.items():
-            if not filter_value or not filtered_products:
+            if not filter_value:
                 continue
-            
-            if filter_key == "nome":
-                # Busca MUITO flexível no nome
-                multi_values = self.split_multi_value(filter_value)
-                all_words = []
-                for val in multi_values:
-                    all_words.extend(val.split())
-                
-                filtered_products = [
-                    p for p in filtered_products
-                    if self.field_match(all_words, str(p.get("nome", "")), "nome")[0]
-                ]
-                
-            elif filter_key == "marca":
-                # Busca flexível na marca
-                multi_values = self.split_multi_value(filter_value)
-                all_words = []
-                for val in multi_values:
-                    all_words.extend(val.split())
-                
-                filtered_products = [
-                    p for p in filtered_products
-                    if self.field_match(all_words, str(p.get("marca", "")), "marca")[0]
-                ]
-                
-            elif filter_key == "categorias":
-                # Busca flexível em categorias
-                multi_values = self.split_multi_value(filter_value)
-                all_words = []
-                for val in multi_values:
-                    all_words.extend(val.split())
-                
-                filtered_products = [
-                    p for p in filtered_products
-                    if self.field_match(all_words, str(p.get("categorias", "")), "categorias")[0]
-                ]
-                
-            elif filter_key == "modelo":
-                multi_values = self.split_multi_value(filter_value)
-                all_words = []
-                for val in multi_values:
-                    all_words.extend(val.split())
-                
-                filtered_products = [
-                    p for p in filtered_products
-                    if self.field_match(all_words, str(p.get("modelo", "")), "modelo")[0]
-                ]
-                
-            elif filter_key == "complemento":
-                multi_values = self.split_multi_value(filter_value)
-                all_words = []
-                for val in multi_values:
-                    all_words.extend(val.split())
-                
-                filtered_products = [
-                    p for p in filtered_products
-                    if self.field_match(all_words, str(p.get("complemento", "")), "complemento")[0]
-                ]
-                
-            elif filter_key == "observacao":
-                multi_values = self.split_multi_value(filter_value)
-                all_words = []
-                for val in multi_values:
-                    all_words.extend(val.split())
-                
-                filtered_products = [
-                    p for p in filtered_products
-                    if self.field_match(all_words, str(p.get("observacao", "")), "observacao")[0]
-                ]
-                
-            elif filter_key in self.exact_fields:
-                # Busca exata para código
-                normalized_values = [
-                    self.normalize_text(v) for v in self.split_multi_value(filter_value)
-                ]
-                
-                filtered_products = [
-                    p for p in filtered_products
-                    if self.normalize_text(str(p.get(filter_key, ""))) in normalized_values
-                ]
-        
-        return filtered_products
+            matched = self.filter_match(catalog, filter_key, filter_value, budget)
+            if matched is not None:
+                match_sets[filter_key] = matched
+        return match_sets
     
-    def apply_range_filters(self, products: List[Dict], precomax: Optional[str]) -> List[Dict]:
-        """Aplica filtros de faixa"""
-        filtered_products = list(products)
+    def apply_filters(self, catalog: CatalogSnapshot, filters: Dict[str, str],
+                      match_sets: Optional[Dict[str, np.ndarray]] = None) -> np.ndarray:
+        """
+        Aplica filtros aos produtos do catálogo: interseção das máscaras de cada filtro.
+        Reaproveita `match_sets` já calculados; retorna as posições dos produtos
+        aprovados, em ordem crescente.
+        """
+        if match_sets is None:
+            match_sets = self.filter_match_sets(catalog, filters)
         
+        masks = [match_sets[k] for k in filters if k in match_sets]
+        if not masks:
+            return np.arange(len(catalog.products))
+        
+        return np.flatnonzero(np.logical_and.reduce(masks))
+    
+    def parse_price_param(self, precomax: Optional[str]) -> Optional[float]:
+        """Converte o parâmetro PrecoMax para float (None se ausente ou inválido)"""
+        if not precomax:
+            return None
+        try:
+            return float(precomax)
+        except ValueError:
+            return None
+    
+    def apply_range_filters(self, catalog: CatalogSnapshot, ids: np.ndarray, precomax: Optional[str]) -> np.ndarray:
+        """Aplica filtros de faixa (vetorizado sobre a coluna de preços)"""
         # Filtro de preço máximo
-        if precomax:
-            try:
-                max_price = float(precomax)
-                filtered_products = [
-                    p for p in filtered_products
-                    if self.convert_price(p.get("preco")) is not None and
-                    self.convert_price(p.get("preco")) <= max_price
-                ]
-            except ValueError:
-                pass
+        max_price = self.parse_price_param(precomax)
+        if max_price is None:
+            return ids
         
-        return filtered_products
+        prices = catalog.prices
+        return ids[prices.valid[ids] & (prices.values[ids] <= max_price)]
     
-    def sort_products(self, products: List[Dict], precomax: Optional[str]) -> List[Dict]:
-        """Ordena produtos baseado nos filtros aplicados"""
-        if not products:
-            return products
+    def sort_products(self, catalog: CatalogSnapshot, ids: np.ndarray, precomax: Optional[str],
+                      limit: Optional[int] = None) -> np.ndarray:
+        """
+        Ordena produtos baseado nos filtros aplicados.
+        Com `limit`, seleciona só os primeiros por seleção parcial em vez de ordenar tudo.
+        """
+        keys = catalog.prices.values[ids]
         
         # Se tem precomax, ordena por proximidade do valor
-        if precomax:
-            try:
-                target_price = float(precomax)
-                return sorted(products, key=lambda p: 
-                    abs((self.convert_price(p.get("preco")) or 0) - target_price))
-            except ValueError:
-                pass
+        target_price = self.parse_price_param(precomax)
+        if target_price is not None:
+            keys = np.abs(keys - target_price)
         
         # Ordenação padrão: por preço crescente
-        return sorted(products, key=lambda p: self.convert_price(p.get("preco")) or 0)
+        return ids[select_top_k(keys, limit)]
     
-    def search_with_fallback(self, products: List[Dict], filters: Dict[str, str],
-                            precomax: Optional[str], excluded_ids: set) -> SearchResult:
-        """Executa busca com fallback progressivo seguindo FALLBACK_PRIORITY"""
-        
-        # Primeira tentativa: busca normal
-        filtered_products = self.apply_filters(products, filters)
-        filtered_products = self.apply_range_filters(filtered_products, precomax)
-        
-        if excluded_ids:
-            filtered_products = [
-                p for p in filtered_products
-                if str(p.get("codigo")) not in excluded_ids
-            ]
-        
-        if filtered_products:
-            sorted_products = self.sort_products(filtered_products, precomax)
-            return SearchResult(
-                products=sorted_products[:20],
-                total_found=len(sorted_products),
-                fallback_info={},
-                removed_filters=[]
-            )
+    def fallback_candidates(self, catalog: CatalogSnapshot, filters: Dict[str, str],
+                            precomax: Optional[str], excluded_ids: set,
+                            budget: Optional[SearchBudget] = None) -> Tuple[List[str], np.ndarray]:
+        """
+        Primeiro degrau do fallback (seguindo FALLBACK_PRIORITY) com resultados.
+        O conjunto de cada filtro é calculado uma vez; cada degrau do fallback
+        é só a interseção dos conjuntos dos filtros restantes.
+        Retorna (filtros removidos, posições aprovadas em ordem crescente);
+        sem resultados em nenhum degrau, as posições vêm vazias.
+        """
+        match_sets = self.filter_match_sets(catalog, filters, budget)
+        excluded_positions = catalog.code_index.positions(excluded_ids) if excluded_ids else None
         
-        # Se não encontrou, inicia fallback
         current_filters = dict(filters)
         removed_filters = []
-        current_precomax = precomax
         
-        for filter_to_remove in FALLBACK_PRIORITY:
-            if filter_to_remove in current_filters:
+        # Primeira tentativa: busca normal (None); depois remove um filtro por vez
+        for filter_to_remove in [None] + FALLBACK_PRIORITY:
+            if filter_to_remove is not None:
+                if filter_to_remove not in current_filters:
+                    continue
                 # Remove filtro
                 current_filters = {k: v for k, v in current_filters.items() if k != filter_to_remove}
                 removed_filters.append(filter_to_remove)
-            else:
-                continue
             
-            # Testa busca após remoção
-            filtered_products = self.apply_filters(products, current_filters)
-            filtered_products = self.apply_range_filters(filtered_products, current_precomax)
+            # Testa busca com os filtros atuais
+            filtered_ids = self.apply_filters(catalog, current_filters, match_sets)
+            filtered_ids = self.apply_range_filters(catalog, filtered_ids, precomax)
             
-            if excluded_ids:
-                filtered_products = [
-                    p for p in filtered_products
-                    if str(p.get("codigo")) not in excluded_ids
-                ]
+            if excluded_positions is not None and len(filtered_ids):
+                filtered_ids = filtered_ids[~np.isin(filtered_ids, excluded_positions)]
             
-            if filtered_products:
-                sorted_products = self.sort_products(filtered_products, current_precomax)
-                return SearchResult(
-                    products=sorted_products[:20],
-                    total_found=len(sorted_products),
-                    fallback_info={"fallback": {"removed_filters": removed_filters}},
-                    removed_filters=removed_filters
-                )
+            if len(filtered_ids):
+                return removed_filters, filtered_ids
         
         # Nenhum resultado
+        return removed_filters, np.empty(0, dtype=np.int64)
+    
+    def make_result(self, removed_filters: List[str], top_ids: np.ndarray, total_found: int,
+                    degraded: bool = False) -> SearchResult:
+        """Monta o resultado da busca a partir das posições da página"""
         return SearchResult(
-            products=[],
-            total_found=0,
-            fallback_info={},
-            removed_filters=removed_filters
+            total_found=total_found,
+            fallback_info={"fallback": {"removed_filters": removed_filters}} if removed_filters and total_found else {},
+            removed_filters=removed_filters,
+            product_ids=top_ids.tolist(),
+            degraded=degraded
         )
+    
+    def search_with_fallback(self, catalog: CatalogSnapshot, filters: Dict[str, str],
+                            precomax: Optional[str], excluded_ids: set,
+                            offset: int = 0, limit: int = SEARCH_PAGE_SIZE,
+                            budget: Optional[SearchBudget] = None) -> SearchResult:
+        """
+        Executa busca com fallback progressivo seguindo FALLBACK_PRIORITY.
+        Retorna a página [offset, offset + limit) dos resultados ordenados.
+        Se o orçamento se esgota, refaz a busca no modo degradado (só os níveis
+        exato, início de palavra e substring) e marca o resultado.
+        """
+        try:
+            removed_filters, filtered_ids = self.fallback_candidates(catalog, filters, precomax, excluded_ids, budget)
+        except SearchBudgetExceeded:
+            budget = SearchBudget(degraded=True)
+            removed_filters, filtered_ids = self.fallback_candidates(catalog, filters, precomax, excluded_ids, budget)
+        
+        top_ids = self.sort_products(catalog, filtered_ids, precomax, limit=offset + limit)[offset:]
+        degraded = budget is not None and budget.degraded
+        return self.make_result(removed_filters, top_ids, len(filtered_ids), degraded)
 
 # Instância global do motor de busca
 search_engine = ProductSearchEngine()
 
+def convert_in_refresh_process() -> int:
+    """Partida a frio com REFRESH_EXECUTOR=process: o arquivo JSON é convertido no processo de atualização"""
+    return run_in_refresh_process(convert_snapshot)
+
+# Catálogo residente em memória (publicado a cada atualização). Com
+# REFRESH_EXECUTOR=process, o servidor só mapeia snapshots binários prontos
+catalog_store = CatalogStore(
+    JSON_FILE, BINARY_FILE, convert=convert_in_refresh_process if REFRESH_EXECUTOR == "process" else None
+)
+
+# Cache de respostas de busca por geração do catálogo
+search_cache = SearchCache()
+
+# Buscas rodam fora do loop de eventos, com fila limitada
+search_executor = SearchExecutor()
+
+# Uma atualização por vez; pedidos durante uma execução são agrupados em uma nova rodada
+refresh_lock = threading.Lock()
+refresh_requested = threading.Event()
+
+# Fim da última atualização bem-sucedida neste processo, inclusive sem alteração nas
+# fontes (nesse caso o snapshot e seu updated_at continuam os mesmos)
+last_refresh_at: Optional[datetime] = None
+
+# Processo dedicado às atualizações (REFRESH_EXECUTOR=process), criado sob demanda.
+# Um único worker persistente preserva o estado do fetcher entre as rodadas.
+refresh_executor: Optional[ProcessPoolExecutor] = None
+
+# Estado de um processo de busca: a fatia do catálogo que ele atende
+shard_worker_state: Dict[str, Any] = {}
+
+def init_search_shard(binary_file: str, shard: int, shard_count: int):
+    """Inicializador do processo de um shard (a fatia é mapeada sob demanda)"""
+    shard_worker_state.update(binary_file=binary_file, shard=shard, shard_count=shard_count, catalog=None)
+
+def load_search_shard(binary_generation: int) -> bool:
+    """Mapeia a fatia do shard se ainda não estiver na geração pedida"""
+    catalog = shard_worker_state["catalog"]
+    if catalog is None or catalog.generation != binary_generation:
+        catalog = shard_worker_state["catalog"] = load_binary_shard(
+            shard_worker_state["binary_file"], shard_worker_state["shard"], shard_worker_state["shard_count"]
+        )
+    return catalog.generation == binary_generation
+
+def search_shard(binary_generation: int, filters: Dict[str, str], precomax: Optional[str],
+                 excluded_ids: set, k: int, budget: Optional[SearchBudget] = None
+                 ) -> Optional[Tuple[List[str], int, List[int], bool]]:
+    """
+    Busca com fallback na fatia do processo.
+    Retorna (filtros removidos, total aprovado no degrau, k primeiras posições no
+    catálogo completo, orçamento esgotado) ou None se a fatia não está na geração pedida.
+    Com o orçamento esgotado, a fatia não devolve resultados: o servidor refaz
+    a busca degradada em todos os shards, para que sejam comparáveis.
+    """
+    catalog: CatalogShard = shard_worker_state["catalog"]
+    if catalog is None or catalog.generation != binary_generation:
+        return None
+    
+    try:
+        removed_filters, filtered_ids = search_engine.fallback_candidates(
+            catalog, filters, precomax, excluded_ids, budget
+        )
+    except SearchBudgetExceeded:
+        return [], 0, [], True
+    
+    top_ids = search_engine.sort_products(catalog, filtered_ids, precomax, limit=k)
+    return removed_filters, len(filtered_ids), (top_ids + catalog.start).tolist(), False
+
+class ShardedSearch:
+    """
+    Executa a busca em processos dedicados, um por fatia contígua do catálogo.
+    Cada shard avalia filtros e fallback na sua fatia e devolve o total e as
+    melhores posições de cada página; o resultado é combinado aqui com a mesma
+    ordenação (chave, posição) de `sort_products`.
+    Retorna None (a busca roda no próprio processo) enquanto os shards não
+    estão prontos na geração do snapshot, ou se o snapshot não é o binário.
+    """
+    
+    def __init__(self, binary_file: str, shard_count: int = SEARCH_SHARDS):
+        self.binary_file = binary_file
+        self.shard_count = shard_count
+        self._executors: List[ProcessPoolExecutor] = []
+        self._generation: Optional[int] = None
+        self._loading: List[Future] = []
+        self._lock = threading.Lock()
+    
+    def _start(self) -> List[ProcessPoolExecutor]:
+        if not self._executors:
+            # Um executor de um único processo por shard: cada pedido chega ao dono da fatia
+            context = multiprocessing.get_context("spawn")
+            self._executors = [
+                ProcessPoolExecutor(max_workers=1, mp_context=context, initializer=init_search_shard,
+                                    initargs=(self.binary_file, shard, self.shard_count))
+                for shard in range(self.shard_count)
+            ]
+        return self._executors
+    
+    def _reset(self):
+        """Descarta os processos (um deles morreu); a próxima busca cria outros"""
+        with self._lock:
+            for executor in self._executors:
+                executor.shutdown(wait=False, cancel_futures=True)
+            self._executors = []
+            self._generation = None
+            self._loading = []
+    
+    def _ready(self, binary_generation: int) -> Optional[List[ProcessPoolExecutor]]:
+        """Executores prontos para a geração; dispara o carregamento das fatias se preciso"""
+        with self._lock:
+            executors = self._start()
+            if self._generation != binary_generation:
+                self._generation = binary_generation
+                self._loading = [executor.submit(load_search_shard, binary_generation) for executor in executors]
+            loading = self._loading
+        
+        if not all(future.done() for future in loading):
+            return None
+        try:
+            if all(future.result() for future in loading):
+                return executors
+        except Exception as e:
+            print(f"Erro ao carregar shards de busca: {e}")
+            self._reset()
+        return None
+    
+    def _gather(self, executors: List[ProcessPoolExecutor], *args: Any) -> Optional[List[Tuple]]:
+        """Executa search_shard em todos os shards (None se algum não pôde responder)"""
+        futures = [executor.submit(search_shard, *args) for executor in executors]
+        try:
+            results = [future.result() for future in futures]
+        except BrokenProcessPool:
+            self._reset()
+            return None
+        if any(result is None for result in results):
+            return None
+        return results
+    
+    def search(self, catalog: CatalogSnapshot, filters: Dict[str, str], precomax: Optional[str],
+               excluded_ids: set, offset: int = 0, limit: int = SEARCH_PAGE_SIZE,
+               budget: Optional[SearchBudget] = None) -> Optional[SearchResult]:
+        if self.shard_count <= 0 or catalog.binary_generation is None:
+            return None
+        executors = self._ready(catalog.binary_generation)
+        if executors is None:
+            return None
+        
+        args = (catalog.binary_generation, filters, precomax, excluded_ids, offset + limit)
+        results = self._gather(executors, *args, budget)
+        degraded = results is not None and any(result[3] for result in results)
+        if degraded:
+            # Orçamento esgotado em algum shard: todos refazem a busca sem rapidfuzz
+            results = self._gather(executors, *args, SearchBudget(degraded=True))
+        if results is None:
+            return None
+        
+        # O degrau do fallback é o primeiro com resultados em algum shard
+        matched = [result for result in results if result[1]]
+        if not matched:
+            return search_engine.make_result(results[0][0], np.empty(0, dtype=np.int64), 0, degraded)
+        removed_filters = min((result[0] for result in matched), key=len)
+        rung = [result for result in matched if len(result[0]) == len(removed_filters)]
+        
+        # Candidatos em ordem de posição: a seleção estável reproduz os empates da busca local
+        candidates = np.sort(np.array([i for result in rung for i in result[2]], dtype=np.int64))
+        top_ids = search_engine.sort_products(catalog, candidates, precomax, limit=offset + limit)[offset:]
+        return search_engine.make_result(removed_filters, top_ids, sum(result[1] for result in rung), degraded)
+    
+    def info(self) -> Dict[str, Any]:
+        """Estado dos shards para o endpoint de status"""
+        loading = self._loading
+        return {
+            "shards": self.shard_count,
+            "processes": len(self._executors),
+            "generation": self._generation,
+            "ready": bool(loading) and all(future.done() for future in loading)
+        }
+
+# Busca distribuída (SEARCH_SHARDS > 0) sobre o snapshot binário
+sharded_search = ShardedSearch(BINARY_FILE)
+
+def run_search(catalog: CatalogSnapshot, filters: Dict[str, str], precomax: Optional[str],
+               excluded_ids: set, offset: int, limit: int, budget: Optional[SearchBudget] = None) -> SearchResult:
+    """Busca com fallback: nos shards, se prontos; senão no próprio processo"""
+    result = sharded_search.search(catalog, filters, precomax, excluded_ids, offset, limit, budget)
+    if result is None:
+        result = search_engine.search_with_fallback(catalog, filters, precomax, excluded_ids, offset, limit, budget)
+    return result
+
 def save_update_status(success: bool, message: str = "", product_count: int = 0):
     """Salva o status da última atualização"""
     status = {
@@ -437,21 +848,95 @@ def get_update_status() -> Dict:
         "product_count": 0
     }
 
+def run_in_refresh_process(fn: Callable[[], Any]) -> Any:
+    """Executa `fn` no processo dedicado às atualizações (uma tarefa por vez)"""
+    global refresh_executor
+    if refresh_executor is None:
+        # spawn: não herda as threads do servidor (fork de processo com threads é inseguro)
+        refresh_executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        return refresh_executor.submit(fn).result()
+    except BrokenProcessPool:
+        # O worker morreu: a próxima rodada cria outro
+        refresh_executor = None
+        raise
+
+def run_fetch() -> Dict:
+    """Executa o fetcher no modo configurado em REFRESH_EXECUTOR"""
+    if REFRESH_EXECUTOR != "process":
+        return fetch_and_convert_json()
+    return run_in_refresh_process(refresh_snapshot)
+
 def wrapped_fetch_and_convert_json():
-    """Wrapper para fetch_and_convert_json com logging de status"""
+    """
+    Wrapper para fetch_and_convert_json com logging de status.
+    Chamadas enquanto uma atualização está em andamento não rodam em paralelo:
+    são agrupadas em uma única nova rodada ao final da atual.
+    """
+    while True:
+        if not refresh_lock.acquire(blocking=False):
+            refresh_requested.set()
+            print("Atualização já em andamento; nova rodada agendada ao final")
+            return
+        
+        try:
+            while True:
+                refresh_requested.clear()
+                run_refresh()
+                if not refresh_requested.is_set():
+                    break
+        finally:
+            refresh_lock.release()
+        
+        # Um pedido feito entre a última verificação e a liberação do lock
+        # encontrou o lock ainda ocupado; sem esta checagem ele se perderia
+        if not refresh_requested.is_set():
+            return
+
+def reload_binary_if_changed():
+    """
+    Remapeia o snapshot binário gravado por outro worker.
+    Pula enquanto uma atualização local está em andamento: ela mesma publica
+    a geração que grava, e carregá-la aqui também a publicaria duas vezes.
+    """
+    if not refresh_lock.acquire(blocking=False):
+        return
+    
+    try:
+        catalog_store.reload_if_changed()
+    finally:
+        refresh_lock.release()
+    
+    # Atualizações pedidas durante o remapeamento foram apenas agendadas
+    if refresh_requested.is_set():
+        wrapped_fetch_and_convert_json()
+
+def run_refresh():
+    """Uma rodada de atualização: busca os dados e publica o novo catálogo"""
+    global last_refresh_at
     try:
         print("Iniciando atualização dos dados...")
-        fetch_and_convert_json()
+        result = run_fetch()
         
-        # Verifica quantos produtos foram carregados
-        product_count = 0
-        if os.path.exists("produtos.json"):
-            try:
-                with open("produtos.json", "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    product_count = len(data.get("produtos", []))
-            except:
-                pass
+        # Publica o novo catálogo em memória (troca atômica)
+        if result and result.get("_unchanged"):
+            # Fontes sem alteração: o catálogo publicado continua válido
+            snapshot = catalog_store.get()
+        elif result and result.get("_binary_generation"):
+            # Mapeia o snapshot binário recém-gravado (compartilhado com os outros workers)
+            snapshot = catalog_store.load_binary()
+        elif result and "produtos" in result:
+            snapshot = catalog_store.publish(result)
+        elif result:
+            # O processo de atualização não gravou o snapshot binário: o servidor não
+            # reconstrói o catálogo por conta própria e mantém o snapshot atual
+            raise RuntimeError("snapshot binário não foi gravado; catálogo atual mantido")
+        else:
+            # Sem fontes configuradas: mantém o snapshot atual ou parte do arquivo
+            snapshot = catalog_store.get()
+        
+        product_count = len(snapshot.products) if snapshot else 0
+        last_refresh_at = datetime.now()
         
         save_update_status(True, "Dados atualizados com sucesso", product_count)
         print(f"Atualização concluída: {product_count} produtos carregados")
@@ -461,49 +946,248 @@ def wrapped_fetch_and_convert_json():
         save_update_status(False, error_message)
         print(error_message)
 
+def render_products(snapshot: CatalogSnapshot, ids: Iterable[int], simples: bool,
+                    meta: Dict[str, Any]) -> bytes:
+    """
+    Corpo JSON com os produtos em "resultados" seguidos dos campos de `meta`.
+    No modo simples, concatena o JSON pré-serializado de cada produto,
+    sem copiar nem alterar os registros do catálogo. Com o catálogo mapeado
+    do snapshot binário, o modo completo concatena o JSON gravado de cada
+    registro, sem decodificá-lo.
+    """
+    if simples:
+        fragments = snapshot.simple_json
+    elif isinstance(snapshot.products, MappedProducts):
+        fragments = snapshot.products.records
+    else:
+        products = snapshot.products
+        return encode_json({"resultados": [products[i] for i in ids], **meta})
+    
+    parts = [b'{"resultados":[', b",".join(fragments[i] for i in ids), b"]"]
+    for key, value in meta.items():
+        parts.append(b"," + encode_json(key) + b":" + encode_json(value))
+    parts.append(b"}")
+    return b"".join(parts)
+
+def negotiate_encoding(accept_encoding: Optional[str], available: Iterable[str]) -> Optional[str]:
+    """Escolhe a compressão aceita pelo cliente (brotli antes de gzip); None = sem compressão"""
+    if not accept_encoding:
+        return None
+    
+    accepted = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    
+    for coding in ("br", "gzip"):
+        if coding in available and accepted.get(coding, accepted.get("*", 0.0)) > 0:
+            return coding
+    return None
+
+def payload_response(request: Request, payload: EncodedPayload) -> Response:
+    """
+    Resposta de um payload estável da geração: atende If-None-Match com 304
+    e escolhe a variante pré-comprimida conforme o Accept-Encoding.
+    """
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"), payload.encoded)
+    headers = {
+        "ETag": payload.variant_etag(encoding),
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding"
+    }
+    
+    if_none_match = request.headers.get("if-none-match")
+    if any(etag_matches(if_none_match, payload.variant_etag(e)) for e in [None, *payload.encoded]):
+        return Response(status_code=304, headers=headers)
+    
+    if encoding:
+        headers["Content-Encoding"] = encoding
+        return Response(content=payload.encoded[encoding], media_type="application/json", headers=headers)
+    
+    return Response(content=payload.body, media_type="application/json", headers=headers)
+
+def json_bytes_response(request: Request, body: bytes) -> Response:
+    """Resposta dinâmica: comprime na hora quando o corpo passa de COMPRESSION_MIN_SIZE"""
+    headers = {"Vary": "Accept-Encoding"}
+    
+    if len(body) >= COMPRESSION_MIN_SIZE:
+        encoding = negotiate_encoding(request.headers.get("accept-encoding"), DYNAMIC_ENCODINGS)
+        if encoding == "br":
+            body = brotli.compress(body, quality=4)
+            headers["Content-Encoding"] = encoding
+        elif encoding == "gzip":
+            body = gzip.compress(body, compresslevel=5)
+            headers["Content-Encoding"] = encoding
+    
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def products_response(request: Request, snapshot: CatalogSnapshot, ids: Iterable[int], simples: bool,
+                      meta: Dict[str, Any]) -> Response:
+    """Monta e comprime uma resposta dinâmica de produtos (chamada no threadpool, fora do loop de eventos)"""
+    return json_bytes_response(request, render_products(snapshot, ids, simples, meta))
+
+def ndjson_response(snapshot: CatalogSnapshot, ids: Iterable[int], simples: bool, total: int,
+                    headers: Optional[Dict[str, str]] = None) -> StreamingResponse:
+    """
+    Resposta NDJSON em streaming: um produto por linha, serializado sob demanda.
+    O total de resultados vai no cabeçalho X-Total-Count.
+    """
+    def generate() -> Iterator[bytes]:
+        products = snapshot.products
+        records = products.records if isinstance(products, MappedProducts) else None
+        simple_json = snapshot.simple_json
+        lines = []
+        for i in ids:
+            if simples:
+                lines.append(simple_json[i])
+            else:
+                lines.append(records[i] if records is not None else encode_json(products[i]))
+            
+            # Envia em blocos para limitar o número de escritas no socket
+            if len(lines) >= NDJSON_CHUNK_SIZE:
+                yield b"\n".join(lines) + b"\n"
+                lines = []
+        
+        if lines:
+            yield b"\n".join(lines) + b"\n"
+    
+    response_headers = {"X-Total-Count": str(total)}
+    if headers:
+        response_headers.update(headers)
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson", headers=response_headers)
+
+def search_ndjson_response(snapshot: CatalogSnapshot, result: SearchResult, simples: bool) -> StreamingResponse:
+    """Resposta NDJSON de uma busca (filtros removidos pelo fallback vão em cabeçalho)"""
+    headers = {}
+    if result.removed_filters and result.fallback_info:
+        headers["X-Fallback-Removed-Filters"] = ",".join(result.removed_filters)
+    if result.degraded:
+        headers["X-Search-Degraded"] = "1"
+    
+    return ndjson_response(snapshot, result.product_ids, simples, result.total_found, headers)
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Verifica o cabeçalho If-None-Match contra o ETag atual"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # Comparação fraca, como manda o RFC 9110 para If-None-Match
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+def parse_page_param(value: Optional[str], name: str) -> Optional[int]:
+    """Converte parâmetros de paginação (inteiros não negativos)"""
+    if value is None or value == "":
+        return None
+    try:
+        parsed = int(value)
+    except ValueError:
+        raise ValueError(f"Parâmetro '{name}' deve ser um inteiro")
+    if parsed < 0:
+        raise ValueError(f"Parâmetro '{name}' não pode ser negativo")
+    return parsed
+
+def pagination_info(offset: int, limit: Optional[int], total: int) -> Dict[str, Any]:
+    """Bloco de paginação da resposta, com o offset da próxima página (se houver)"""
+    next_offset = None
+    if limit is not None and offset + limit < total:
+        next_offset = offset + limit
+    return {
+        "offset": offset,
+        "limit": limit,
+        "proximo_offset": next_offset
+    }
+
+def load_catalog() -> Tuple[Optional[CatalogSnapshot], Optional[str]]:
+    """Obtém o snapshot atual do catálogo (ou a mensagem de erro do carregamento)"""
+    try:
+        return catalog_store.get(), None
+    except (json.JSONDecodeError, ValueError, KeyError) as e:
+        return None, str(e)
+
+async def current_catalog() -> Tuple[Optional[CatalogSnapshot], Optional[str]]:
+    """Como load_catalog, mas a partida a frio (leitura do disco) roda fora do loop de eventos"""
+    snapshot = catalog_store.current()
+    if snapshot is not None:
+        return snapshot, None
+    return await run_in_threadpool(load_catalog)
+
+def overloaded_response() -> Response:
+    """Resposta imediata quando a fila de buscas está cheia"""
+    return FastJSONResponse(
+        content={
+            "error": "Servidor ocupado, tente novamente em instantes",
+            "resultados": [],
+            "total_encontrado": 0
+        },
+        status_code=503,
+        headers={"Retry-After": str(SEARCH_RETRY_AFTER)}
+    )
+
 @app.on_event("startup")
 def schedule_tasks():
     """Agenda tarefas de atualização de dados"""
     scheduler = BackgroundScheduler(timezone="America/Sao_Paulo")
     
-    # Executa a cada 2 horas
-    scheduler.add_job(wrapped_fetch_and_convert_json, "interval", hours=2)
+    # Partida a quente: publica o último snapshot salvo e já começa a servir
+    snapshot, load_error = load_catalog()
+    if load_error:
+        print(f"Erro ao carregar o último snapshot: {load_error}")
+    elif snapshot is None:
+        print("Nenhum snapshot salvo; aguardando a primeira atualização")
+    else:
+        print(f"Snapshot carregado na inicialização: {len(snapshot.products)} produtos")
+    
+    # Executa a cada 2 horas; a primeira atualização roda já, em segundo plano
+    scheduler.add_job(
+        wrapped_fetch_and_convert_json, "interval", hours=REFRESH_INTERVAL_HOURS,
+        next_run_time=datetime.now(scheduler.timezone)
+    )
+    
+    # Remapeia o snapshot binário quando outro worker grava uma nova geração
+    scheduler.add_job(reload_binary_if_changed, "interval", seconds=BINARY_POLL_SECONDS)
     
     scheduler.start()
-    wrapped_fetch_and_convert_json()  # Executa uma vez na inicialização
 
 @app.get("/api/data")
-def get_data(request: Request):
-    """Endpoint principal para busca de produtos"""
+async def get_data(request: Request):
+    """
+    Endpoint principal para busca de produtos.
+    Payloads pré-computados e respostas em cache saem direto do loop de eventos;
+    as buscas vão para o executor dedicado e a montagem e compressão dos corpos
+    dinâmicos rodam no threadpool.
+    """
+    # O orçamento da busca inclui a espera na fila do executor
+    budget = SearchBudget.from_ms(SEARCH_TIME_BUDGET_MS)
+    
+    # Obtém o snapshot atual do catálogo
+    snapshot, load_error = await current_catalog()
     
-    # Verifica se o arquivo de dados existe
-    if not os.path.exists("produtos.json"):
-        return JSONResponse(
+    if load_error:
+        return FastJSONResponse(
             content={
-                "error": "Nenhum dado disponível",
+                "error": f"Erro ao carregar dados: {load_error}",
                 "resultados": [],
                 "total_encontrado": 0
             },
-            status_code=404
+            status_code=500
         )
     
-    # Carrega os dados
-    try:
-        with open("produtos.json", "r", encoding="utf-8") as f:
-            data = json.load(f)
-        
-        products = data.get("produtos", [])
-        if not isinstance(products, list):
-            raise ValueError("Formato inválido: 'produtos' deve ser uma lista")
-            
-    except (json.JSONDecodeError, ValueError, KeyError) as e:
-        return JSONResponse(
+    if snapshot is None:
+        return FastJSONResponse(
             content={
-                "error": f"Erro ao carregar dados: {str(e)}",
+                "error": "Nenhum dado disponível",
                 "resultados": [],
                 "total_encontrado": 0
             },
-            status_code=500
+            status_code=404
         )
     
     # Extrai parâmetros da query
@@ -513,6 +1197,24 @@ def get_data(request: Request):
     precomax = search_engine.get_max_value_from_range_param(query_params.pop("PrecoMax", None))
     simples = query_params.pop("simples", None)
     excluir = query_params.pop("excluir", None)
+    formato = query_params.pop("formato", None)
+    
+    # Paginação (limit/offset)
+    limit_param = query_params.pop("limit", None)
+    offset_param = query_params.pop("offset", None)
+    try:
+        limit = parse_page_param(limit_param, "limit")
+        offset = parse_page_param(offset_param, "offset") or 0
+    except ValueError as e:
+        return FastJSONResponse(
+            content={
+                "error": str(e),
+                "resultados": [],
+                "total_encontrado": 0
+            },
+            status_code=400
+        )
+    paginated = limit_param is not None or offset_param is not None
     
     # Parâmetro especial para busca por código
     codigo_param = query_params.pop("codigo", None)
@@ -532,28 +1234,16 @@ def get_data(request: Request):
     
     # BUSCA POR CÓDIGO ESPECÍFICO
     if codigo_param:
-        product_found = None
-        for product in products:
-            if str(product.get("codigo")) == str(codigo_param):
-                product_found = product
-                break
+        found_id = snapshot.code_index.get(str(codigo_param))
         
-        if product_found:
+        if found_id is not None:
             # Aplica modo simples se solicitado
-            if simples == "1":
-                imagens = product_found.get("imagens")
-                if isinstance(imagens, list) and len(imagens) > 0:
-                    product_found["imagens"] = [imagens[0]]
-                else:
-                    product_found["imagens"] = []
-            
-            return JSONResponse(content={
-                "resultados": [product_found],
+            return await run_in_threadpool(products_response, request, snapshot, [found_id], simples == "1", {
                 "total_encontrado": 1,
                 "info": f"Produto encontrado por código: {codigo_param}"
             })
         else:
-            return JSONResponse(content={
+            return FastJSONResponse(content={
                 "resultados": [],
                 "total_encontrado": 0,
                 "error": f"Produto com código {codigo_param} não encontrado"
@@ -569,136 +1259,245 @@ def get_data(request: Request):
     
     # Se não há filtros de busca, retorna todo o estoque
     if not has_search_filters:
-        all_products = list(products)
+        # Estoque completo sem exclusões nem paginação: payload pré-serializado e pré-comprimido
+        if not excluded_ids and not paginated and formato != "ndjson":
+            if simples == "1":
+                return payload_response(request, snapshot.full_stock_simple)
+            return payload_response(request, snapshot.full_stock)
+        
+        # Ordem por preço crescente pré-calculada para a geração do catálogo
+        sorted_ids = snapshot.prices.order
         
         # Remove códigos excluídos se especificado
         if excluded_ids:
-            all_products = [
-                p for p in all_products
-                if str(p.get("codigo")) not in excluded_ids
-            ]
+            sorted_ids = sorted_ids[~np.isin(sorted_ids, snapshot.code_index.positions(excluded_ids))]
         
-        # Ordena por preço crescente (padrão)
-        sorted_products = sorted(all_products, key=lambda p: search_engine.convert_price(p.get("preco")) or 0)
+        # Só a página pedida é materializada
+        page_ids = sorted_ids[offset:] if limit is None else sorted_ids[offset:offset + limit]
         
-        # Aplica modo simples se solicitado
-        if simples == "1":
-            for product in sorted_products:
-                imagens = product.get("imagens")
-                if isinstance(imagens, list) and len(imagens) > 0:
-                    product["imagens"] = [imagens[0]]
-                else:
-                    product["imagens"] = []
-        
-        return JSONResponse(content={
-            "resultados": sorted_products,
-            "total_encontrado": len(sorted_products),
+        # Modo streaming: um produto por linha, direto do snapshot
+        if formato == "ndjson":
+            return ndjson_response(snapshot, page_ids, simples == "1", len(sorted_ids))
+        
+        meta = {
+            "total_encontrado": len(sorted_ids),
             "info": "Exibindo todo o estoque disponível"
-        })
+        }
+        if paginated:
+            meta["paginacao"] = pagination_info(offset, limit, len(sorted_ids))
+        
+        # Aplica modo simples se solicitado
+        return await run_in_threadpool(products_response, request, snapshot, page_ids, simples == "1", meta)
+    
+    # Na busca, a página padrão são os 20 primeiros resultados
+    search_limit = SEARCH_PAGE_SIZE if limit is None else limit
     
-    # Executa a busca com fallback
-    result = search_engine.search_with_fallback(
-        products, filters, precomax, excluded_ids
+    # Consultas repetidas são respondidas pelo cache
+    cache_key = search_cache.make_key(
+        snapshot.generation, filters, precomax, excluded_ids, offset, search_limit
     )
+    result = search_cache.get(cache_key)
     
-    # Aplica modo simples se solicitado
-    if simples == "1" and result.products:
-        for product in result.products:
-            imagens = product.get("imagens")
-            if isinstance(imagens, list) and len(imagens) > 0:
-                product["imagens"] = [imagens[0]]
-            else:
-                product["imagens"] = []
+    if result is None:
+        # Executa a busca com fallback no executor dedicado
+        try:
+            result = await search_executor.run(
+                run_search, snapshot, filters, precomax, excluded_ids, offset, search_limit, budget
+            )
+        except SearchOverloaded:
+            return overloaded_response()
+        
+        # Resultados degradados não vão para o cache: a mesma consulta com folga recupera o rapidfuzz
+        if not result.degraded:
+            search_cache.put(cache_key, result)
+    
+    if formato == "ndjson":
+        return search_ndjson_response(snapshot, result, simples == "1")
     
     # Monta resposta
-    response_data = {
-        "resultados": result.products,
+    meta = {
         "total_encontrado": result.total_found
     }
     
+    if paginated:
+        meta["paginacao"] = pagination_info(offset, search_limit, result.total_found)
+    
     # Adiciona informações de fallback apenas se houver filtros removidos
     if result.fallback_info:
-        response_data.update(result.fallback_info)
+        meta.update(result.fallback_info)
+    
+    # Busca interrompida pelo orçamento de tempo: sem o nível fuzzy (rapidfuzz)
+    if result.degraded:
+        meta["busca_degradada"] = True
     
     # Mensagem especial se não encontrou nada
     if result.total_found == 0:
-        response_data["instrucao_ia"] = (
+        meta["instrucao_ia"] = (
             "Não encontramos produtos com os parâmetros informados "
             "e também não encontramos opções próximas."
         )
     
-    return JSONResponse(content=response_data)
+    # Aplica modo simples se solicitado
+    return await run_in_threadpool(products_response, request, snapshot, result.product_ids, simples == "1", meta)
 
-@app.get("/list")
-def list_products():
-    """Endpoint que retorna lista de produtos agrupados por categoria em formato compacto"""
+async def products_by_code(request: Request, codigos: List[str], simples: bool) -> Response:
+    """
+    Resolve uma lista de códigos pelo índice de códigos da geração atual.
+    Os produtos vêm na ordem pedida (cada código uma vez); os códigos sem
+    produto são listados em "nao_encontrados".
+    """
+    if not codigos:
+        return FastJSONResponse(
+            content={"error": "Informe ao menos um código em 'codigos'", "resultados": [], "total_encontrado": 0},
+            status_code=400
+        )
+    if len(codigos) > BATCH_MAX_CODES:
+        return FastJSONResponse(
+            content={
+                "error": f"Máximo de {BATCH_MAX_CODES} códigos por consulta",
+                "resultados": [],
+                "total_encontrado": 0
+            },
+            status_code=400
+        )
+    
+    snapshot, load_error = await current_catalog()
     
-    # Verifica se o arquivo de dados existe
-    if not os.path.exists("produtos.json"):
-        return JSONResponse(
+    if load_error:
+        return FastJSONResponse(
             content={
-                "error": "Nenhum dado disponível"
+                "error": f"Erro ao carregar dados: {load_error}",
+                "resultados": [],
+                "total_encontrado": 0
+            },
+            status_code=500
+        )
+    
+    if snapshot is None:
+        return FastJSONResponse(
+            content={
+                "error": "Nenhum dado disponível",
+                "resultados": [],
+                "total_encontrado": 0
             },
             status_code=404
         )
     
-    # Carrega os dados
+    found_ids = []
+    not_found = []
+    for codigo in dict.fromkeys(codigos):
+        found_id = snapshot.code_index.get(codigo)
+        if found_id is None:
+            not_found.append(codigo)
+        else:
+            found_ids.append(found_id)
+    
+    return await run_in_threadpool(products_response, request, snapshot, found_ids, simples, {
+        "total_encontrado": len(found_ids),
+        "nao_encontrados": not_found
+    })
+
+@app.get("/api/produtos")
+async def get_products_by_code(request: Request):
+    """Consulta em lote por código: /api/produtos?codigos=a,b,c"""
+    codigos = [c.strip() for c in request.query_params.get("codigos", "").split(",") if c.strip()]
+    return await products_by_code(request, codigos, request.query_params.get("simples") == "1")
+
+@app.post("/api/produtos")
+async def post_products_by_code(request: Request):
+    """Consulta em lote por código com corpo JSON: {"codigos": ["a", "b", ...]}"""
     try:
-        with open("produtos.json", "r", encoding="utf-8") as f:
-            data = json.load(f)
-        
-        products = data.get("produtos", [])
-        if not isinstance(products, list):
-            return JSONResponse(
-                content={
-                    "error": "Formato inválido"
-                },
-                status_code=500
-            )
-        
-        # Agrupa produtos por categoria em formato compacto
-        categorias_dict = {}
-        
-        for p in products:
-            categorias_str = p.get("categorias", "sem categoria")
-            
-            # Monta linha CSV: codigo,nome
-            linha = f"{p.get('codigo', '')},{p.get('nome', '')}"
-            
-            # Se produto tem múltiplas categorias (separadas por vírgula)
-            if categorias_str:
-                cats = [cat.strip() for cat in str(categorias_str).split(",")]
-            else:
-                cats = ["sem categoria"]
-            
-            # Adiciona o produto em cada categoria que ele pertence
-            for cat in cats:
-                if not cat:
-                    cat = "sem categoria"
-                    
-                if cat not in categorias_dict:
-                    categorias_dict[cat] = []
-                
-                categorias_dict[cat].append(linha)
-        
-        # Ordena as categorias alfabeticamente
-        categorias_ordenadas = dict(sorted(categorias_dict.items()))
-        
-        return JSONResponse(content=categorias_ordenadas)
-            
-    except Exception as e:
-        return JSONResponse(
+        body = serializer.loads(await request.body())
+        codigos = body["codigos"]
+        if not isinstance(codigos, list):
+            raise TypeError
+    except (json.JSONDecodeError, KeyError, TypeError):
+        return FastJSONResponse(
+            content={
+                "error": "Corpo inválido: esperado {\"codigos\": [...]}",
+                "resultados": [],
+                "total_encontrado": 0
+            },
+            status_code=400
+        )
+    
+    codigos = [str(c).strip() for c in codigos if str(c).strip()]
+    simples = str(body.get("simples", request.query_params.get("simples"))) == "1"
+    return await products_by_code(request, codigos, simples)
+
+@app.get("/list")
+async def list_products(request: Request):
+    """
+    Endpoint que retorna lista de produtos agrupados por categoria em formato compacto.
+    A lista é montada uma vez por geração do catálogo; clientes com o ETag atual recebem 304.
+    """
+    
+    # Obtém o snapshot atual do catálogo
+    snapshot, load_error = await current_catalog()
+    
+    if load_error:
+        return FastJSONResponse(
             content={
-                "error": f"Erro ao processar dados: {str(e)}"
+                "error": f"Erro ao processar dados: {load_error}"
             },
             status_code=500
         )
+    
+    if snapshot is None:
+        return FastJSONResponse(
+            content={
+                "error": "Nenhum dado disponível"
+            },
+            status_code=404
+        )
+    
+    return payload_response(request, snapshot.category_listing)
 
 @app.get("/api/health")
-def health_check():
+async def health_check():
     """Endpoint de verificação de saúde"""
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
+@app.get("/api/ready")
+async def readiness_check():
+    """
+    Endpoint de prontidão: 200 quando há catálogo carregado para servir
+    (e, com READY_MAX_AGE_SECONDS, se os dados não estão velhos demais).
+    A idade conta da última confirmação dos dados: a atualização bem-sucedida
+    mais recente (mesmo sem alteração nas fontes) ou a data do snapshot.
+    Independente do /api/health, que só indica que o processo está vivo.
+    """
+    snapshot = catalog_store.current()
+    confirmed_at = last_refresh_at
+    if snapshot is not None and snapshot.updated_at:
+        try:
+            updated_at = datetime.fromisoformat(snapshot.updated_at)
+            confirmed_at = max(confirmed_at, updated_at) if confirmed_at else updated_at
+        except ValueError:
+            pass
+    
+    age_seconds = None
+    if snapshot is not None and confirmed_at is not None:
+        age_seconds = round((datetime.now() - confirmed_at).total_seconds(), 1)
+    
+    stale = bool(READY_MAX_AGE_SECONDS) and (age_seconds is None or age_seconds > READY_MAX_AGE_SECONDS)
+    ready = snapshot is not None and not stale
+    
+    return FastJSONResponse(
+        content={
+            "ready": ready,
+            "has_data": snapshot is not None,
+            "product_count": len(snapshot.products) if snapshot is not None else 0,
+            "updated_at": snapshot.updated_at if snapshot is not None else None,
+            "last_refresh_at": last_refresh_at.isoformat() if last_refresh_at else None,
+            "age_seconds": age_seconds,
+            "stale": stale,
+            "refreshing": refresh_lock.locked(),
+            "timestamp": datetime.now().isoformat()
+        },
+        status_code=200 if ready else 503
+    )
+
 @app.get("/api/status")
 def get_status():
     """Endpoint para verificar status da última atualização dos dados"""
@@ -724,6 +1523,11 @@ def get_status():
             "size_bytes": data_file_size,
             "modified_at": data_file_modified
         },
+        "catalog": catalog_store.info(),
+        "search_cache": search_cache.stats(),
+        "search_shards": sharded_search.info(),
+        "search_executor": search_executor.stats(),
+        "serializer": serializer.BACKEND,
         "current_time": datetime.now().isoformat()
     }
 
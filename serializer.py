@@ -0,0 +1,46 @@
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional: sem ele, usa o json da biblioteca padrão
+    orjson = None
+
+# =================== CAMADA DE SERIALIZAÇÃO =======================
+
+# Backend em uso ("orjson" ou "json"), exposto no endpoint de status
+BACKEND = "orjson" if orjson is not None else "json"
+
+def dumps(obj: Any, pretty: bool = False) -> bytes:
+    """
+    Serializa para JSON em UTF-8.
+    Saída compacta por padrão; `pretty` indenta com 2 espaços.
+    """
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option)
+
+    if pretty:
+        return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def loads(data: Union[bytes, str]) -> Any:
+    """
+    Desserializa JSON de bytes ou str.
+    Erros de formato levantam json.JSONDecodeError nos dois backends.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def dump_file(obj: Any, path: str, pretty: bool = False):
+    """Grava JSON em arquivo (compacto por padrão)"""
+    with open(path, "wb") as f:
+        f.write(dumps(obj, pretty=pretty))
+
+def load_file(path: str) -> Any:
+    """Lê um arquivo JSON inteiro"""
+    with open(path, "rb") as f:
+        return loads(f.read())